@@ -1,8 +1,14 @@
-from flask import Flask, render_template, request
-from database import search_products
-import pandas as pd
+from flask import Flask, render_template, request, jsonify
+from database import init_db, search_products, list_products, products_version, API_COLUMNS
+from collections import OrderedDict
+from datetime import datetime, timezone
+import threading
+import hashlib
+import base64
 import sqlite3
 import logging
+import math
+import json
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,6 +16,142 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+DB_NAME = 'data/ebay_data.db'
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+# Rendered API responses kept in memory, keyed by table version and query string
+RESPONSE_CACHE_SIZE = 256
+
+_local = threading.local()
+
+def get_db():
+    """This thread's database connection, opened (and migrated) on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = init_db(DB_NAME)
+        if conn is None:
+            raise sqlite3.OperationalError(f"cannot open {DB_NAME}")
+        _local.conn = conn
+    return conn
+
+class ResponseCache:
+    """Thread-safe LRU of response bodies. Keys include the table version, so writes never serve stale data."""
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+response_cache = ResponseCache()
+
+def encode_cursor(cursor):
+    """Opaque page token for a (sort value, id) cursor."""
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort='id'):
+    """
+    (sort value, id) cursor from a page token.
+    Args:
+        token (str): Token from encode_cursor
+        sort (str): Column the pages are sorted on
+    Raises:
+        ValueError: If the token is not a cursor for that column
+    """
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        raise ValueError('Invalid after cursor')
+    if not isinstance(cursor, list) or len(cursor) != 2:
+        raise ValueError('Invalid after cursor')
+    value, row_id = cursor
+    # Pages only hold rows with a sort value; ids and counts are integers, prices and ratings reals
+    types = (int,) if sort in ('id', 'review_count', 'sold_count') else (int, float)
+    if (type(row_id) is not int or type(value) not in types
+            or (type(value) is float and not math.isfinite(value))):
+        raise ValueError('Invalid after cursor')
+    return value, row_id
+
+def _float_arg(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+def _products_page(args):
+    """Run list_products for the API query parameters and return the JSON body."""
+    fields = [field for field in args.get('fields', '').split(',') if field] or API_COLUMNS
+    sort = args.get('sort', 'id')
+    descending = sort.startswith('-')
+    try:
+        limit = min(max(int(args.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    after = decode_cursor(args['after'], sort.lstrip('-')) if args.get('after') else None
+    products, cursor = list_products(
+        get_db(), fields, sort.lstrip('-'), descending, after, limit, query=args.get('q') or None,
+        min_price=_float_arg(args, 'min_price'), max_price=_float_arg(args, 'max_price'),
+        min_rating=_float_arg(args, 'min_rating'),
+        location=args.get('location') or None, currency=args.get('currency') or None)
+    return json.dumps({
+        'products': products,
+        'count': len(products),
+        'next': encode_cursor(cursor) if cursor else None,
+    }).encode('utf-8')
+
+@app.route('/api/products')
+def api_products():
+    """
+    Products as JSON, one page at a time.
+    Query parameters: fields (comma-separated), sort (a column, '-' prefix for
+    descending), limit, after (the next token of the previous page), q
+    (full-text search), min_price, max_price, min_rating, location, currency.
+    Responses carry an ETag and Last-Modified tied to the products table's
+    write version, so clients can revalidate with a 304, and rendered pages
+    are cached in memory until the next write.
+    """
+    query_string = tuple(sorted(request.args.items(multi=True)))
+    try:
+        conn = get_db()
+        version, modified = products_version(conn)
+        body = response_cache.get((version, query_string))
+        if body is None:
+            # Read the version and the page from one snapshot, so the body is cached under its own version
+            conn.execute('BEGIN')
+            try:
+                version, modified = products_version(conn)
+                body = _products_page(request.args)
+            finally:
+                conn.commit()
+            response_cache.put((version, query_string), body)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except sqlite3.Error as e:
+        logger.error(f"Product API database error: {e}")
+        return jsonify(error=f"Database error: {e}"), 503
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(f"{version}-{hashlib.sha1(repr(query_string).encode('utf-8')).hexdigest()[:16]}")
+    response.last_modified = datetime.fromtimestamp(modified, timezone.utc)
+    # Clients may store responses but must revalidate, which costs a 304 while nothing changed
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     """Render homepage with product data and search functionality."""
@@ -19,15 +161,13 @@ def index():
     
     try:
         if query:
-            products = search_products(query)
+            products = search_products(query, DB_NAME)
         else:
-            # Load a sample of data (first 100 rows)
-            conn = sqlite3.connect('data/ebay_data.db')
-            products = pd.read_sql_query("SELECT * FROM products LIMIT 100", conn).to_dict('records')
-            conn.close()
+            # First 100 products, straight from SQLite
+            products, _ = list_products(get_db(), limit=100)
         
     except sqlite3.OperationalError as e:
-        error = f"Database error: {e}. Ensure 'data/ebay_data.db' exists and is populated."
+        error = f"Database error: {e}. Ensure '{DB_NAME}' exists and is populated."
         logger.error(error)
     except Exception as e:
         error = f"Unexpected error: {e}"
@@ -0,0 +1,81 @@
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from cleaning import clean_frame, summarize
+
+logger = logging.getLogger(__name__)
+
+def clean_price(price):
+    """Row-wise baseline: convert price string to float, handling ranges and currencies."""
+    try:
+        if not isinstance(price, str):
+            logger.warning(f"Invalid price type: {type(price)} - {price}")
+            return None
+        price = price.replace('$', '').replace(',', '').strip()
+        if '-' in price:
+            price = price.split('-')[0].strip()
+        return float(price)
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"Failed to clean price '{price}': {e}")
+        return None
+
+def clean_rating(rating):
+    """Row-wise baseline: extract percentage from rating string."""
+    try:
+        if not isinstance(rating, str):
+            return None
+        # Handle formats like '98.7%' or 'sambasaturne (3) 100%'
+        match = pd.Series([rating]).str.extract(r'(\d+\.\d+)%')[0].iloc[0]
+        return float(match) if pd.notna(match) else None
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"Failed to clean rating '{rating}': {e}")
+        return None
+
+def synthetic_frame(rows, seed=0, distinct_prices=50000, sellers=20000):
+    """
+    Frame with the same columns and value mix as the scraper export: dollar
+    prices and ranges, some other currencies and N/A, seller ratings with
+    feedback counts, and a handful of locations.
+    """
+    rng = np.random.default_rng(seed)
+    amounts = rng.uniform(1, 3000, distinct_prices)
+    price_pool = np.array([f"${a:,.2f}" if i % 4 else f"${a:,.2f} to ${a * 1.6:,.2f}"
+                           for i, a in enumerate(amounts)] + ['C $45.00', 'GBP 12.50', 'N/A'], dtype=object)
+    rating_pool = np.array([f"seller{i} ({rng.integers(1, 200000):,}) {rng.uniform(90, 100):.1f}%"
+                            for i in range(sellers)] + [np.nan], dtype=object)
+    locations = np.array(['Located in United States', 'Located in China', 'Located in Canada', np.nan], dtype=object)
+    return pd.DataFrame({
+        'price': rng.choice(price_pool, rows),
+        'rating': rng.choice(rating_pool, rows),
+        'location': rng.choice(locations, rows),
+    })
+
+def timed(label, rows, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.2f} s  {rows / elapsed:>14,.0f} rows/sec")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare row-wise and vectorized cleaning throughput.')
+    parser.add_argument('--rows', type=int, default=1000000, help='Rows in the synthetic frame')
+    parser.add_argument('--rating-sample', type=int, default=20000,
+                        help='Rows timed for .apply(clean_rating), which runs at a few thousand rows/sec')
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    # The row-wise path logs a warning per bad value; keep console I/O out of the timing
+    logger.setLevel(logging.ERROR)
+
+    timed('.apply(clean_price)', args.rows, lambda: df['price'].apply(clean_price))
+    sample = df['rating'].head(args.rating_sample)
+    timed(f'.apply(clean_rating) [{len(sample)}]', len(sample), lambda: sample.apply(clean_rating))
+    cleaned, invalid = timed('clean_frame (vectorized)', args.rows, lambda: clean_frame(df))
+    timed('summarize', args.rows, lambda: summarize(df))
+    print(f"Invalid values: {invalid}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
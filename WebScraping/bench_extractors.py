@@ -0,0 +1,84 @@
+import argparse
+import glob
+import time
+from extractors import EXTRACTORS, FIELDS, get_extractor
+
+def load_pages(pattern):
+    """Read saved eBay result pages matching a glob pattern."""
+    pages = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+def bench_engine(extractor, pages, repeat):
+    """Time full-page parsing plus extraction, then the cost of each field on its own."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extractor.parse(html)
+    total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    docs = [extractor.parse_document(html) for html in pages]
+    parse_time = time.perf_counter() - start
+    items = [item for doc in docs for item in extractor.find_items(doc)]
+
+    field_costs = {}
+    for field in FIELDS:
+        start = time.perf_counter()
+        for item in items:
+            extractor.find_field(item, field)
+        field_costs[field.name] = (time.perf_counter() - start) / max(1, len(items))
+
+    start = time.perf_counter()
+    for item in items:
+        extractor.extract_item(item)
+    item_cost = (time.perf_counter() - start) / max(1, len(items))
+
+    return {
+        'pages_per_sec': len(pages) * repeat / total,
+        'parse_ms_per_page': parse_time / len(pages) * 1000,
+        'items': len(items),
+        'item_us': item_cost * 1e6,
+        'field_us': {name: cost * 1e6 for name, cost in field_costs.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML extraction engines on saved eBay result pages.')
+    parser.add_argument('--pages', default='data/pages/*.html', help='Glob of saved result pages')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the page set')
+    parser.add_argument('--engines', default=','.join(EXTRACTORS), help='Comma-separated engines to compare')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    if not pages:
+        print(f"No pages match '{args.pages}'. Save some result pages first.")
+        return
+
+    engines = []
+    for name in args.engines.split(','):
+        try:
+            engines.append(get_extractor(name))
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+
+    print(f"{len(pages)} pages, {args.repeat} passes")
+    baseline = None
+    for extractor in engines:
+        stats = bench_engine(extractor, pages, args.repeat)
+        print(f"\n[{extractor.name}] {stats['pages_per_sec']:.1f} pages/sec, "
+              f"parse {stats['parse_ms_per_page']:.2f} ms/page, {stats['items']} items, "
+              f"extract_item {stats['item_us']:.1f} us")
+        for name, cost in stats['field_us'].items():
+            print(f"    {name:<12} {cost:8.1f} us/item")
+
+        # Engines must agree on the extracted data
+        output = [extractor.parse(html) for html in pages]
+        if baseline is None:
+            baseline = (extractor.name, output)
+        elif output != baseline[1]:
+            print(f"    WARNING: output differs from {baseline[0]}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
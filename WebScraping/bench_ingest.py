@@ -0,0 +1,61 @@
+import argparse
+import os
+import tempfile
+import time
+from database import init_db, bulk_insert_items, configure_connection, _item_rows, UPSERT_SQL, VALUES_SOURCE
+
+def synthetic_items(count, offset=0):
+    """Generate listings shaped like scraper output, each with a unique item ID."""
+    for i in range(offset, offset + count):
+        yield {
+            'title': f"Laptop model {i % 5000} Intel Core i5 8GB RAM 256GB SSD",
+            'price': f"${100 + i % 900}.99",
+            'url': f"https://www.ebay.com/itm/{200000000000 + i}?_skw=laptop&hash=item{i:x}",
+            'description': 'Pre-Owned',
+            'reviews': str(i % 300),
+            'rating': f"seller{i % 997} ({i % 5000}) 98.{i % 10}%",
+            'location': 'Located in United States',
+            'units_sold': str(i % 50),
+        }
+
+def bench_row_by_row(db_path, count):
+    """The previous ingest pattern on the current schema: default pragmas, one execute() per item."""
+    conn = init_db(db_path)
+    configure_connection(conn, {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'cache_size': -2000, 'mmap_size': 0})
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    for row in _item_rows(synthetic_items(count)):
+        cursor.execute(UPSERT_SQL.format(source=VALUES_SOURCE), row)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def bench_bulk(db_path, count, chunk_size, use_staging):
+    conn = init_db(db_path)
+    start = time.perf_counter()
+    bulk_insert_items(conn, synthetic_items(count), chunk_size, use_staging)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark products ingest throughput.')
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated row counts')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per transaction')
+    parser.add_argument('--skip-row-by-row', action='store_true', help='Skip the slow baseline')
+    args = parser.parse_args()
+
+    modes = [('executemany', lambda path, n: bench_bulk(path, n, args.chunk_size, False)),
+             ('staging', lambda path, n: bench_bulk(path, n, args.chunk_size, True))]
+    if not args.skip_row_by_row:
+        modes.insert(0, ('row-by-row', bench_row_by_row))
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        for name, run in modes:
+            with tempfile.TemporaryDirectory() as tmp:
+                elapsed = run(os.path.join(tmp, 'bench.db'), size)
+            print(f"{size:>9} rows  {name:<12} {elapsed:8.2f} s  {size / elapsed:>12,.0f} rows/sec")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+# Whole-column counterparts of normalize.py, for data frames loaded from exports. The
+# regexes are normalize.py's, so a value parses the same way at ingest and in a frame.
+from normalize import PRICE_PATTERN, CURRENCY_PATTERN, RATING_PATTERN, CURRENCY_CODES
+
+PRICE_BUCKETS = [0, 100, 200, 300, 500, 750, 1000, 2000, np.inf]
+
+def _as_text(series):
+    """Strings only; anything else (NaN, numbers from Excel) becomes NaN."""
+    return series.where(series.map(type) == str)
+
+def _by_unique(series, parse):
+    """
+    Run a column parser once per distinct value and broadcast the results.
+    Scraped columns repeat heavily (same prices, same sellers), so this cuts
+    the regex work to the number of unique strings.
+    """
+    codes, uniques = pd.factorize(series)
+    parsed = parse(pd.Series(uniques, dtype=object))
+    # Code -1 (missing) has no row in parsed, so reindex yields NaN for it
+    return parsed.reindex(codes).set_axis(series.index)
+
+def _parse_prices(text):
+    text = _as_text(text)
+    parts = text.str.extract(PRICE_PATTERN.pattern)
+    low = pd.to_numeric(parts['low'].str.replace(',', '', regex=False), errors='coerce')
+    high = pd.to_numeric(parts['high'].str.replace(',', '', regex=False), errors='coerce').fillna(low)
+    # Most prices are plain dollars; only run the currency regex on the rest
+    dollars = text.str.startswith('$', na=False)
+    currency = pd.Series('USD', index=text.index, dtype=object).where(dollars)
+    others = text[~dollars & text.notna()]
+    currency[others.index] = others.str.extract(CURRENCY_PATTERN.pattern)['symbol'].map(CURRENCY_CODES)
+    return pd.DataFrame({
+        'price_min': np.fmin(low, high),
+        'price_max': np.fmax(low, high),
+        'currency': currency,
+    })
+
+def parse_prices(prices):
+    """
+    Parse a column of price strings such as '$20.00' or '$239.00 to $349.00'.
+    Args:
+        prices (pd.Series): Raw price text
+    Returns:
+        pd.DataFrame: price_min, price_max (float) and currency columns
+    """
+    return _by_unique(prices, _parse_prices)
+
+def parse_ratings(ratings):
+    """Extract seller feedback percentages ('98.7%', 'seller (3) 100%') as floats."""
+    return _by_unique(ratings, lambda text: pd.to_numeric(_as_text(text).str.extract(RATING_PATTERN.pattern)[0], errors='coerce'))
+
+def clean_frame(df):
+    """
+    Add price_numeric (lower bound of the price), price_max, currency and
+    rating_numeric columns to a scraped-products frame.
+    Returns:
+        tuple: (cleaned frame, dict of invalid value counts per source column)
+    """
+    df = df.copy()
+    prices = parse_prices(df['price'])
+    df['price_numeric'] = prices['price_min']
+    df['price_max'] = prices['price_max']
+    df['currency'] = prices['currency']
+    df['rating_numeric'] = parse_ratings(df['rating'])
+    invalid = {
+        'price': int(df['price_numeric'].isna().sum()),
+        'rating': int(df['rating_numeric'].isna().sum()),
+    }
+    return df, invalid
+
+def price_by_location(df, top=10):
+    """Count, mean and median USD price per location, highest mean first (other currencies are left out)."""
+    grouped = df[df['currency'] == 'USD'].dropna(subset=['price_numeric']).groupby('location')['price_numeric']
+    return grouped.agg(['count', 'mean', 'median']).sort_values('mean', ascending=False).head(top)
+
+def price_buckets(df, edges=PRICE_BUCKETS):
+    """Number of listings and mean rating per price band."""
+    bands = pd.cut(df['price_numeric'], edges, right=False)
+    return df.groupby(bands, observed=True).agg(
+        listings=('price_numeric', 'size'),
+        mean_rating=('rating_numeric', 'mean'),
+    )
+
+def summarize(df):
+    """
+    Aggregate summary of a raw scraped-products frame.
+    Returns:
+        dict: rows, invalid counts, price by location and price buckets
+    """
+    cleaned, invalid = clean_frame(df)
+    return {
+        'rows': len(cleaned),
+        'invalid': invalid,
+        'price_by_location': price_by_location(cleaned),
+        'price_buckets': price_buckets(cleaned),
+    }
\ No newline at end of file
@@ -1,14 +1,302 @@
 import sqlite3
 import logging
+import time
+import json
+import re
+import html
+from normalize import TYPED_COLUMNS, typed_values, parse_price, parse_rating, parse_count
+from itertools import islice
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Listing URLs look like /itm/388650608361?... or /itm/some-title/388650608361
+ITEM_ID_PATTERN = re.compile(r'/itm/(?:[^/?#]+/)?(\d+)')
+
+def parse_item_id(url):
+    """Extract the canonical eBay item ID from a listing URL, or None."""
+    if not isinstance(url, str):
+        return None
+    match = ITEM_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def _migrate_item_identity(conn):
+    """Key products on the eBay item ID and add the scrape job checkpoint table."""
+    cursor = conn.cursor()
+    conn.create_function('ebay_item_id', 1, parse_item_id)
+    cursor.execute('ALTER TABLE products ADD COLUMN item_id TEXT')
+    cursor.execute('UPDATE products SET item_id = ebay_item_id(url)')
+    # Keep the most recently scraped copy of each listing
+    cursor.execute('''
+        DELETE FROM products
+        WHERE item_id IS NOT NULL
+          AND id NOT IN (SELECT MAX(id) FROM products WHERE item_id IS NOT NULL GROUP BY item_id)
+    ''')
+    logger.info(f"Removed {cursor.rowcount} duplicate listings")
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_products_item_id ON products(item_id)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scrape_jobs (
+            job_key TEXT PRIMARY KEY,
+            query TEXT,
+            params TEXT,
+            next_page INTEGER,
+            items_collected INTEGER,
+            status TEXT,
+            last_success TIMESTAMP
+        )
+    ''')
+
+def _migrate_search_index(conn):
+    """Add an FTS5 index over title and description, kept in sync by triggers."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            title, description, content='products', content_rowid='id'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF title, description ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO products_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+def _migrate_typed_columns(conn):
+    """Add typed numeric columns derived from the raw text fields, backfill and index them."""
+    cursor = conn.cursor()
+    for column, sql_type in [('price_min', 'REAL'), ('price_max', 'REAL'), ('currency', 'TEXT'),
+                             ('rating_pct', 'REAL'), ('review_count', 'INTEGER'), ('sold_count', 'INTEGER')]:
+        cursor.execute(f'ALTER TABLE products ADD COLUMN {column} {sql_type}')
+    conn.create_function('price_min', 1, lambda p: parse_price(p)[0])
+    conn.create_function('price_max', 1, lambda p: parse_price(p)[1])
+    conn.create_function('price_currency', 1, lambda p: parse_price(p)[2])
+    conn.create_function('rating_pct', 1, parse_rating)
+    conn.create_function('parse_count', 1, parse_count)
+    cursor.execute('''
+        UPDATE products SET
+            price_min = price_min(price), price_max = price_max(price), currency = price_currency(price),
+            rating_pct = rating_pct(rating), review_count = parse_count(reviews), sold_count = parse_count(units_sold)
+    ''')
+    for column in ['price_min', 'rating_pct', 'review_count', 'sold_count']:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_products_{column} ON products({column})')
+
+def _migrate_batch_search_indexing(conn):
+    """
+    Index new rows once per batch in the ingest path instead of from a per-row trigger.
+    The insert trigger makes FTS5 flush on every row and halves executemany
+    ingest (about 12.5k vs 25k rows/sec at 100k rows in bench_ingest.py).
+    Only insert_items and bulk_insert_items add products, and both index what
+    they add in the same transaction; anything else that inserts into
+    products must call _index_new_rows too, or run rebuild_search_index.
+    Updates and deletes stay on their triggers.
+    """
+    conn.execute('DROP TRIGGER IF EXISTS products_fts_insert')
+
+# Rating histogram resolution: bins are tenths of a percentage point
+RATING_BIN_SCALE = 10
+
+# Remove a listing's old values from the aggregates (OLD) or add its new ones (NEW).
+# Prices are only comparable in one currency, so the location aggregates count USD listings.
+_ANALYTICS_REMOVE = """
+    UPDATE location_price_stats SET listings = listings - 1, price_sum = price_sum - OLD.price_min
+    WHERE location = OLD.location AND OLD.price_min IS NOT NULL AND OLD.currency = 'USD';
+    UPDATE location_prices SET listings = listings - 1
+    WHERE location = OLD.location AND price = OLD.price_min AND OLD.currency = 'USD';
+    DELETE FROM location_price_stats WHERE location = OLD.location AND listings <= 0;
+    DELETE FROM location_prices WHERE location = OLD.location AND price = OLD.price_min AND listings <= 0;
+    UPDATE rating_bins SET listings = listings - 1 WHERE bin = CAST(ROUND(OLD.rating_pct * {scale}) AS INTEGER);
+""".format(scale=RATING_BIN_SCALE)
+_ANALYTICS_ADD = """
+    INSERT INTO location_price_stats (location, listings, price_sum)
+    SELECT NEW.location, 1, NEW.price_min
+    WHERE NEW.location IS NOT NULL AND NEW.price_min IS NOT NULL AND NEW.currency = 'USD'
+    ON CONFLICT(location) DO UPDATE SET listings = listings + 1, price_sum = price_sum + excluded.price_sum;
+    INSERT INTO location_prices (location, price, listings)
+    SELECT NEW.location, NEW.price_min, 1
+    WHERE NEW.location IS NOT NULL AND NEW.price_min IS NOT NULL AND NEW.currency = 'USD'
+    ON CONFLICT(location, price) DO UPDATE SET listings = listings + 1;
+    INSERT INTO rating_bins (bin, listings)
+    SELECT CAST(ROUND(NEW.rating_pct * {scale}) AS INTEGER), 1 WHERE NEW.rating_pct IS NOT NULL
+    ON CONFLICT(bin) DO UPDATE SET listings = listings + 1;
+""".format(scale=RATING_BIN_SCALE)
+
+def _update_analytics(conn, after_id):
+    """
+    Add rows inserted since after_id to the aggregate tables, one grouped
+    statement per table, so the cost follows the batch size rather than the
+    table size. Updates and deletes are maintained by triggers.
+    """
+    conn.execute('''
+        INSERT INTO location_price_stats (location, listings, price_sum)
+        SELECT location, COUNT(*), SUM(price_min) FROM products
+        WHERE id > ? AND location IS NOT NULL AND price_min IS NOT NULL AND currency = 'USD'
+        GROUP BY location
+        ON CONFLICT(location) DO UPDATE SET
+            listings = listings + excluded.listings, price_sum = price_sum + excluded.price_sum
+    ''', (after_id,))
+    conn.execute('''
+        INSERT INTO location_prices (location, price, listings)
+        SELECT location, price_min, COUNT(*) FROM products
+        WHERE id > ? AND location IS NOT NULL AND price_min IS NOT NULL AND currency = 'USD'
+        GROUP BY location, price_min
+        ON CONFLICT(location, price) DO UPDATE SET listings = listings + excluded.listings
+    ''', (after_id,))
+    conn.execute(f'''
+        INSERT INTO rating_bins (bin, listings)
+        SELECT CAST(ROUND(rating_pct * {RATING_BIN_SCALE}) AS INTEGER), COUNT(*) FROM products
+        WHERE id > ? AND rating_pct IS NOT NULL
+        GROUP BY 1
+        ON CONFLICT(bin) DO UPDATE SET listings = listings + excluded.listings
+    ''', (after_id,))
+
+def _migrate_analytics(conn):
+    """Add materialized price-by-location and rating-histogram aggregates and backfill them."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS location_price_stats (
+            location TEXT PRIMARY KEY,
+            listings INTEGER NOT NULL,
+            price_sum REAL NOT NULL
+        )
+    ''')
+    # Listings per distinct price, from which medians are read without touching products
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS location_prices (
+            location TEXT NOT NULL,
+            price REAL NOT NULL,
+            listings INTEGER NOT NULL,
+            PRIMARY KEY (location, price)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rating_bins (
+            bin INTEGER PRIMARY KEY,
+            listings INTEGER NOT NULL
+        )
+    ''')
+    _create_analytics_triggers(conn)
+    _update_analytics(conn, 0)
+
+def _create_analytics_triggers(conn):
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS products_analytics_update
+        AFTER UPDATE OF location, price_min, currency, rating_pct ON products BEGIN
+            {_ANALYTICS_REMOVE}
+            {_ANALYTICS_ADD}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS products_analytics_delete AFTER DELETE ON products BEGIN
+            {_ANALYTICS_REMOVE}
+        END
+    ''')
+
+def _migrate_usd_price_stats(conn):
+    """Rebuild the aggregates so price by location only averages USD listings."""
+    conn.execute('DROP TRIGGER IF EXISTS products_analytics_update')
+    conn.execute('DROP TRIGGER IF EXISTS products_analytics_delete')
+    _create_analytics_triggers(conn)
+    for table in ['location_price_stats', 'location_prices', 'rating_bins']:
+        conn.execute(f'DELETE FROM {table}')
+    _update_analytics(conn, 0)
+
+# Per-connection tuning: WAL lets readers (the Flask app) run during ingest,
+# synchronous=NORMAL is durable across application crashes in WAL mode
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # 64 MB
+    'mmap_size': 268435456,  # 256 MB
+    'temp_store': 'MEMORY',
+}
+
+# Raw text as scraped, then the typed values derived from it (see normalize.py)
+TEXT_COLUMNS = ['title', 'price', 'url', 'description', 'reviews', 'rating', 'location', 'units_sold']
+INGEST_COLUMNS = ['item_id'] + TEXT_COLUMNS + TYPED_COLUMNS
+
+# Unchanged listings (ignoring the per-crawl URL tracking parameters) are not rewritten
+UPSERT_SQL = '''
+    INSERT INTO products ({columns})
+    {{source}}
+    ON CONFLICT(item_id) DO UPDATE SET
+        {updates}
+    WHERE ({compared}) IS NOT ({compared_excluded})
+'''.format(
+    columns=', '.join(INGEST_COLUMNS),
+    updates=', '.join(f'{c} = excluded.{c}' for c in INGEST_COLUMNS[1:]),
+    compared=', '.join(c for c in TEXT_COLUMNS if c != 'url'),
+    compared_excluded=', '.join(f'excluded.{c}' for c in TEXT_COLUMNS if c != 'url'),
+)
+VALUES_SOURCE = f"VALUES ({', '.join('?' for _ in INGEST_COLUMNS)})"
+
+def configure_connection(conn, pragmas=PRAGMAS):
+    """Apply journal and cache pragmas to a connection."""
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def _migrate_write_version(conn):
+    """Add a version number and modification time for products, bumped by every write."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            modified REAL NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO table_versions VALUES ('products', 1, ?)", (time.time(),))
+    # Ingest bumps the version once per batch (see _bump_version); deletes happen outside it
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_version_delete AFTER DELETE ON products BEGIN
+            UPDATE table_versions SET version = version + 1, modified = (julianday('now') - 2440587.5) * 86400.0
+            WHERE name = 'products';
+        END
+    ''')
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _migrate_item_identity,
+    _migrate_search_index,
+    _migrate_typed_columns,
+    _migrate_batch_search_indexing,
+    _migrate_analytics,
+    _migrate_write_version,
+    _migrate_usd_price_stats,
+]
+
+def migrate(conn):
+    """Bring an existing database up to the current schema."""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Applying schema migration {number}: {migration.__name__}")
+        # DDL is transactional in SQLite, so a failed migration leaves no trace
+        conn.execute('BEGIN')
+        try:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
 def init_db(db_name='data/ebay_data.db'):
     """Initialize SQLite database with a products table."""
     try:
-        conn = sqlite3.connect(db_name)
+        conn = configure_connection(sqlite3.connect(db_name))
         cursor = conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS products (
@@ -24,52 +312,378 @@ def init_db(db_name='data/ebay_data.db'):
             )
         ''')
         conn.commit()
+        migrate(conn)
         logger.info("Database initialized")
         return conn
     except sqlite3.Error as e:
         logger.error(f"Database error: {e}")
         return None
 
-def store_data(items, db_name='data/ebay_data.db'):
+def _item_rows(items):
+    for item in items:
+        yield (
+            parse_item_id(item['url']),
+            item['title'], item['price'], item['url'], item['description'],
+            item['reviews'], item['rating'], item['location'], item['units_sold'],
+            *typed_values(item)
+        )
+
+def _dedupe_rows(rows):
+    """Keep the last row per item ID, so no listing is both inserted and updated in one batch."""
+    latest = {}
+    unkeyed = []
+    for row in rows:
+        if row[0] is None:
+            unkeyed.append(row)
+        else:
+            latest[row[0]] = row
+    return list(latest.values()) + unkeyed
+
+def _max_product_id(conn):
+    """
+    Highest product ID, read under the write lock.
+    Rows above it are this batch's new rows only if no other connection can
+    commit in between, so a write transaction is opened first (BEGIN IMMEDIATE)
+    unless the caller already holds one; the caller still commits.
+    """
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM products').fetchone()[0]
+
+def _index_new_rows(conn, after_id):
+    """
+    Add rows inserted since after_id to the search index in one statement.
+    Products has no insert trigger (see _migrate_batch_search_indexing), so
+    every code path that inserts rows calls this in the same transaction.
+    """
+    conn.execute('''
+        INSERT INTO products_fts (rowid, title, description)
+        SELECT id, title, description FROM products WHERE id > ?
+    ''', (after_id,))
+
+def _bump_version(conn, changed):
+    """Record that a batch changed products, so cached API responses go stale."""
+    if changed:
+        conn.execute("UPDATE table_versions SET version = version + 1, modified = ? WHERE name = 'products'",
+                     (time.time(),))
+
+def _upsert_rows(conn, rows):
+    rows = _dedupe_rows(rows)
+    after_id = _max_product_id(conn)
+    changed = conn.executemany(UPSERT_SQL.format(source=VALUES_SOURCE), rows).rowcount
+    _index_new_rows(conn, after_id)
+    _update_analytics(conn, after_id)
+    _bump_version(conn, changed)
+    return changed
+
+def insert_items(conn, items):
+    """
+    Upsert scraped items keyed on their eBay item ID; the caller commits.
+    Listings that are unchanged since the last crawl are not rewritten.
+    Returns:
+        int: Number of rows inserted or updated
+    """
+    return _upsert_rows(conn, _item_rows(items))
+
+def _create_staging_table(conn):
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS products_staging (
+            item_id TEXT, title TEXT, price TEXT, url TEXT, description TEXT,
+            reviews TEXT, rating TEXT, location TEXT, units_sold TEXT,
+            price_min REAL, price_max REAL, currency TEXT, rating_pct REAL,
+            review_count INTEGER, sold_count INTEGER
+        )
+    ''')
+
+def _merge_staging(conn):
+    """Upsert everything in the staging table into products in one statement."""
+    after_id = _max_product_id(conn)
+    # WHERE true keeps the parser from reading ON CONFLICT as a join constraint
+    changed = conn.execute(UPSERT_SQL.format(
+        source=f"SELECT {', '.join(INGEST_COLUMNS)} FROM products_staging WHERE true")).rowcount
+    _index_new_rows(conn, after_id)
+    _update_analytics(conn, after_id)
+    _bump_version(conn, changed)
+    conn.execute('DELETE FROM products_staging')
+    return changed
+
+def bulk_insert_items(conn, items, chunk_size=10000, use_staging=False):
+    """
+    Ingest any number of items in chunked transactions.
+    Args:
+        conn (sqlite3.Connection): Connection from init_db
+        items (iterable): Item dictionaries; consumed lazily
+        chunk_size (int): Items per transaction
+        use_staging (bool): Load each chunk into a temporary staging table with
+            plain INSERTs, then merge it into products with a single upsert
+    Returns:
+        tuple: (items processed, rows inserted or updated)
+    """
+    if use_staging:
+        _create_staging_table(conn)
+    processed = changed = 0
+    rows = _item_rows(items)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        with conn:
+            if use_staging:
+                conn.executemany(f"INSERT INTO products_staging ({', '.join(INGEST_COLUMNS)}) {VALUES_SOURCE}",
+                                 _dedupe_rows(chunk))
+                changed += _merge_staging(conn)
+            else:
+                changed += _upsert_rows(conn, chunk)
+        processed += len(chunk)
+    return processed, changed
+
+def store_data(items, db_name='data/ebay_data.db', chunk_size=10000, use_staging=False):
     """Store scraped items in SQLite database."""
     conn = init_db(db_name)
     if not conn:
         return
-    
+
     try:
-        cursor = conn.cursor()
-        for item in items:
-            cursor.execute('''
-                INSERT INTO products (title, price, url, description, reviews, rating, location, units_sold)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                item['title'], item['price'], item['url'], item['description'],
-                item['reviews'], item['rating'], item['location'], item['units_sold']
-            ))
-        conn.commit()
-        logger.info(f"Stored {len(items)} items in database")
+        processed, changed = bulk_insert_items(conn, items, chunk_size, use_staging)
+        logger.info(f"Stored {processed} items in database ({changed} new or changed)")
     except sqlite3.Error as e:
         logger.error(f"Error storing data: {e}")
     finally:
         conn.close()
 
-def search_products(query, db_name='data/ebay_data.db'):
-    """Search products by keyword in title or description."""
+def job_key(query, params):
+    """Stable identifier for a scrape job: the query plus its crawl parameters."""
+    return json.dumps({'query': query, **params}, sort_keys=True)
+
+def get_job(conn, query, params):
+    """
+    Load the checkpoint for a scrape job.
+    Returns:
+        dict: Job state, or None if the job has never run
+    """
+    row = conn.execute('''
+        SELECT next_page, items_collected, status, last_success FROM scrape_jobs WHERE job_key = ?
+    ''', (job_key(query, params),)).fetchone()
+    if not row:
+        return None
+    return {'next_page': row[0], 'items_collected': row[1], 'status': row[2], 'last_success': row[3]}
+
+def save_checkpoint(conn, query, params, next_page, items_collected, status='running'):
+    """Record job progress; the caller commits it together with the page's items."""
+    conn.execute('''
+        INSERT INTO scrape_jobs (job_key, query, params, next_page, items_collected, status, last_success)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(job_key) DO UPDATE SET
+            next_page = excluded.next_page, items_collected = excluded.items_collected,
+            status = excluded.status, last_success = excluded.last_success
+    ''', (job_key(query, params), query, json.dumps(params, sort_keys=True), next_page, items_collected, status))
+
+def rebuild_search_index(db_name='data/ebay_data.db'):
+    """Rebuild the full-text index from the products table."""
+    conn = init_db(db_name)
+    if not conn:
+        return
+    try:
+        with conn:
+            conn.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+            conn.execute("INSERT INTO products_fts (products_fts) VALUES ('optimize')")
+        logger.info("Search index rebuilt")
+    finally:
+        conn.close()
+
+def price_by_location(conn, top=10):
+    """
+    Listings, mean and median USD price for the locations with the highest mean
+    price, read from the materialized aggregates (see _update_analytics).
+    Listings priced in other currencies are left out.
+    Returns:
+        list: (location, listings, mean, median) tuples, highest mean first
+    """
+    rows = conn.execute('''
+        SELECT location, listings, price_sum / listings FROM location_price_stats
+        WHERE listings > 0 ORDER BY 3 DESC LIMIT ?
+    ''', (top,)).fetchall()
+    results = []
+    for location, listings, mean in rows:
+        # Walk the location's distinct prices to the middle listing(s)
+        lower = upper = None
+        seen = 0
+        for price, count in conn.execute('''
+            SELECT price, listings FROM location_prices WHERE location = ? AND listings > 0 ORDER BY price
+        ''', (location,)):
+            seen += count
+            if lower is None and seen >= (listings + 1) // 2:
+                lower = price
+            if seen >= listings // 2 + 1:
+                upper = price
+                break
+        results.append((location, listings, mean, (lower + upper) / 2))
+    return results
+
+def rating_histogram(conn):
+    """
+    Seller ratings from the materialized histogram, at RATING_BIN_SCALE resolution.
+    Returns:
+        list: (rating percentage, listings) tuples in rating order
+    """
+    rows = conn.execute('SELECT bin, listings FROM rating_bins WHERE listings > 0 ORDER BY bin').fetchall()
+    return [(bin / RATING_BIN_SCALE, listings) for bin, listings in rows]
+
+# Columns the product API can return, and the indexed ones it can sort on
+API_COLUMNS = ['id', 'item_id'] + TEXT_COLUMNS + TYPED_COLUMNS
+SORT_COLUMNS = ['id', 'price_min', 'rating_pct', 'review_count', 'sold_count']
+
+def products_version(conn):
+    """
+    Write version of the products table.
+    Returns:
+        tuple: (version number, modification time in seconds since the epoch)
+    """
+    return conn.execute("SELECT version, modified FROM table_versions WHERE name = 'products'").fetchone()
+
+def list_products(conn, fields=None, sort='id', descending=False, after=None, limit=50, query=None,
+                  min_price=None, max_price=None, min_rating=None, location=None, currency=None):
+    """
+    One page of products in sort order, using keyset pagination: each page
+    starts after the (sort value, id) of the previous page's last row, so a
+    page deep into the table costs the same as the first.
+    Args:
+        conn (sqlite3.Connection): Database connection
+        fields (list): Columns to return, from API_COLUMNS (all by default)
+        sort (str): Column from SORT_COLUMNS; when it is not id, rows without a value are left out
+        descending (bool): Sort high to low
+        after (tuple): (sort value, id) of the last row of the previous page, or None for the first page
+        limit (int): Rows per page
+        query (str): Only products whose title or description matches this full-text search
+        min_price, max_price (float): Bounds on price_min
+        min_rating (float): Lower bound on rating_pct
+        location, currency (str): Exact matches
+    Returns:
+        tuple: (list of product dictionaries, (sort value, id) to pass as after for the next page, or None)
+    Raises:
+        ValueError: For an unknown field or sort column
+    """
+    fields = fields or API_COLUMNS
+    unknown = [field for field in fields if field not in API_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort on '{sort}'. Choose from: {', '.join(SORT_COLUMNS)}")
+
+    source = 'products p'
+    conditions, params = [], []
+    if query:
+        match = fts_query(query)
+        if match is None:
+            return [], None
+        source = 'products_fts JOIN products p ON p.id = products_fts.rowid'
+        conditions.append('products_fts MATCH ?')
+        params.append(match)
+    if sort != 'id':
+        conditions.append(f'p.{sort} IS NOT NULL')
+    for condition, value in [('p.price_min >= ?', min_price), ('p.price_min <= ?', max_price),
+                             ('p.rating_pct >= ?', min_rating), ('p.location = ?', location),
+                             ('p.currency = ?', currency)]:
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    if after is not None:
+        op = '<' if descending else '>'
+        if sort == 'id':
+            conditions.append(f'p.id {op} ?')
+            params.append(after[1])
+        else:
+            conditions.append(f'(p.{sort}, p.id) {op} (?, ?)')
+            params.extend(after)
+
+    direction = 'DESC' if descending else 'ASC'
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    # The sort key is selected after the requested fields to build the next cursor
+    rows = conn.execute(f'''
+        SELECT {', '.join(f'p.{field}' for field in fields)}, p.{sort}, p.id
+        FROM {source} {where}
+        ORDER BY p.{sort} {direction}, p.id {direction}
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    products = [dict(zip(fields, row[:len(fields)])) for row in rows]
+    cursor = tuple(rows[-1][len(fields):]) if has_more else None
+    return products, cursor
+
+def fts_query(text, prefix=True):
+    """
+    Turn free text into an FTS5 query: every word must match, and with
+    prefix=True the last word also matches as a prefix (search-as-you-type).
+    """
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if prefix:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+# Private-use characters mark snippet matches so the text can be escaped safely
+_MARK_START, _MARK_END = '\ue000', '\ue001'
+
+def _highlight(snippet):
+    return html.escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+def _like_search(cursor, query, limit):
+    cursor.execute('''
+        SELECT title, price, url, description, reviews, rating, location, units_sold
+        FROM products
+        WHERE title LIKE ? OR description LIKE ?
+        LIMIT ?
+    ''', (f'%{query}%', f'%{query}%', limit))
+    return [row + (None, None) for row in cursor.fetchall()]
+
+def search_products(query, db_name='data/ebay_data.db', limit=100, prefix=True):
+    """
+    Search products by keyword in title or description.
+    Results are ranked with bm25 (title matches weigh more) and carry HTML
+    snippets with the matching terms wrapped in <mark>. Databases without the
+    full-text index fall back to a LIKE scan.
+    Args:
+        query (str): Search text
+        db_name (str): SQLite database path
+        limit (int): Maximum number of results
+        prefix (bool): Match the last word as a prefix
+    Returns:
+        list: Product dictionaries, best match first
+    """
     conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT title, price, url, description, reviews, rating, location, units_sold
-            FROM products
-            WHERE title LIKE ? OR description LIKE ?
-            LIMIT 100
-        ''', (f'%{query}%', f'%{query}%'))
+        match = fts_query(query, prefix)
+        if match is None:
+            return []
+        try:
+            cursor.execute('''
+                SELECT p.title, p.price, p.url, p.description, p.reviews, p.rating, p.location, p.units_sold,
+                       snippet(products_fts, 0, ?, ?, '...', 12),
+                       snippet(products_fts, 1, ?, ?, '...', 12)
+                FROM products_fts
+                JOIN products p ON p.id = products_fts.rowid
+                WHERE products_fts MATCH ?
+                ORDER BY bm25(products_fts, 10.0, 1.0)
+                LIMIT ?
+            ''', (_MARK_START, _MARK_END, _MARK_START, _MARK_END, match, limit))
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            if 'no such table' not in str(e):
+                raise
+            logger.warning("Search index missing; run 'python database.py rebuild-index'. Falling back to LIKE.")
+            rows = _like_search(cursor, query, limit)
         results = [
             {
                 'title': row[0], 'price': row[1], 'url': row[2], 'description': row[3],
-                'reviews': row[4], 'rating': row[5], 'location': row[6], 'units_sold': row[7]
+                'reviews': row[4], 'rating': row[5], 'location': row[6], 'units_sold': row[7],
+                'title_snippet': _highlight(row[8]) if row[8] else None,
+                'description_snippet': _highlight(row[9]) if row[9] else None
             }
-            for row in cursor.fetchall()
+            for row in rows
         ]
         logger.info(f"Found {len(results)} results for search query: {query}")
         return results
@@ -77,4 +691,13 @@ def search_products(query, db_name='data/ebay_data.db'):
         logger.error(f"Search error: {e}")
         return []
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Maintenance commands for the products database.')
+    parser.add_argument('command', choices=['rebuild-index'], help='rebuild-index: rebuild the full-text search index')
+    parser.add_argument('--db', default='data/ebay_data.db', help='SQLite database path')
+    args = parser.parse_args()
+    if args.command == 'rebuild-index':
+        rebuild_search_index(args.db)
\ No newline at end of file
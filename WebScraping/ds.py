@@ -1,5 +1,5 @@
-import pandas as pd
-df = pd.read_excel('data/ebay_data.xlsx')
+from storage import load_products
+df = load_products(columns=['title', 'price', 'rating', 'price_min', 'rating_pct'])
 print(df.head())
 print(df['price'].head())
-print(df['rating'].head())
\ No newline at end of file
+print(df['rating'].head())
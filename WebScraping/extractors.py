@@ -0,0 +1,156 @@
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup
+from collections import namedtuple
+import logging
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # lxml is optional; the BeautifulSoup path always works
+    lxml_html = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# One entry per extracted field: the element that holds it, the attribute to read
+# (None for the element text) and the clean-up applied to the raw string
+Field = namedtuple('Field', ['name', 'tag', 'css_class', 'attr', 'clean'])
+
+FIELDS = [
+    Field('title', 'div', 's-item__title', None, lambda s: s.strip()),
+    Field('price', 'span', 's-item__price', None, lambda s: s.strip()),
+    Field('url', 'a', 's-item__link', 'href', lambda s: s),
+    # Description is limited in search results, may need item page
+    Field('description', 'div', 's-item__subtitle', None, lambda s: s.strip()),
+    Field('reviews', 'span', 's-item__reviews-count', None, lambda s: s.strip().split()[0]),
+    # Star rating
+    Field('rating', 'span', 's-item__seller-info-text', None, lambda s: s.strip()),
+    Field('location', 'span', 's-item__location', None, lambda s: s.strip().replace('from ', '')),
+    Field('units_sold', 'span', 's-item__quantity-sold', None, lambda s: s.strip().split()[0]),
+]
+
+ITEM_CLASS = 's-item__wrapper'
+NEXT_CLASS = 'pagination__next'
+
+class Extractor(ABC):
+    """Base class: parse a result page into item dictionaries and a next-page flag."""
+    name = None
+
+    @abstractmethod
+    def parse_document(self, html):
+        """Parse page HTML into the engine's document object."""
+
+    @abstractmethod
+    def find_items(self, doc):
+        """The result item elements of a parsed page."""
+
+    @abstractmethod
+    def find_field(self, item, field):
+        """Extract a single field from an item, or 'N/A' if it is missing."""
+
+    def extract_item(self, item):
+        return {field.name: self.find_field(item, field) for field in FIELDS}
+
+    @abstractmethod
+    def has_next(self, doc):
+        """Whether the parsed page links to a next page."""
+
+    def parse(self, html):
+        """
+        Parse a search result page.
+        Args:
+            html (str): Page HTML
+        Returns:
+            tuple: (list of item dictionaries, whether a next page exists)
+        """
+        doc = self.parse_document(html)
+        return [self.extract_item(item) for item in self.find_items(doc)], self.has_next(doc)
+
+class SoupExtractor(Extractor):
+    """Original extraction path: html.parser tree and one find() per field."""
+    name = 'soup'
+
+    def parse_document(self, html):
+        return BeautifulSoup(html, 'html.parser')
+
+    def find_items(self, doc):
+        return doc.find_all('div', class_=ITEM_CLASS)
+
+    def find_field(self, item, field):
+        tag = item.find(field.tag, class_=field.css_class)
+        if not tag:
+            return 'N/A'
+        return field.clean(tag.get(field.attr, 'N/A') if field.attr else tag.text)
+
+    def has_next(self, doc):
+        next_page = doc.find('a', class_=NEXT_CLASS)
+        return bool(next_page) and 'disabled' not in next_page.get('class', [])
+
+def _class_xpath(tag, css_class):
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]"
+
+class LxmlExtractor(Extractor):
+    """
+    libxml2 parser with precompiled XPath selectors.
+    Items are extracted in a single walk over each wrapper that fills all
+    fields at once instead of one tree search per field.
+    """
+    name = 'lxml'
+
+    def __init__(self):
+        if lxml_html is None:
+            raise ImportError("lxml is not installed")
+        self._items = etree.XPath('//' + _class_xpath('div', ITEM_CLASS))
+        self._next = etree.XPath('//' + _class_xpath('a', NEXT_CLASS))
+        self._field_xpaths = {field.name: etree.XPath('.//' + _class_xpath(field.tag, field.css_class))
+                              for field in FIELDS}
+        self._by_tag_class = {(field.tag, field.css_class): field for field in FIELDS}
+        self._tags = sorted({field.tag for field in FIELDS})
+
+    def parse_document(self, html):
+        return lxml_html.fromstring(html)
+
+    def find_items(self, doc):
+        return self._items(doc)
+
+    def _value(self, element, field):
+        return field.clean(element.get(field.attr, 'N/A') if field.attr else element.text_content())
+
+    def find_field(self, item, field):
+        matches = self._field_xpaths[field.name](item)
+        return self._value(matches[0], field) if matches else 'N/A'
+
+    def extract_item(self, item):
+        found = {}
+        for element in item.iter(*self._tags):
+            classes = element.get('class')
+            if not classes:
+                continue
+            for css_class in classes.split():
+                field = self._by_tag_class.get((element.tag, css_class))
+                # Keep the first match in document order, like find()
+                if field and field.name not in found:
+                    found[field.name] = self._value(element, field)
+            if len(found) == len(FIELDS):
+                break
+        return {field.name: found.get(field.name, 'N/A') for field in FIELDS}
+
+    def has_next(self, doc):
+        matches = self._next(doc)
+        return bool(matches) and 'disabled' not in matches[0].get('class', '').split()
+
+EXTRACTORS = {'soup': SoupExtractor, 'lxml': LxmlExtractor}
+
+def get_extractor(name='auto'):
+    """
+    Return an extractor by name.
+    Args:
+        name (str): 'lxml', 'soup', or 'auto' (lxml if installed, else soup)
+    Returns:
+        Extractor: Extractor instance
+    """
+    if name == 'auto':
+        name = 'lxml' if lxml_html is not None else 'soup'
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor '{name}'. Choose from: {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name]()
\ No newline at end of file
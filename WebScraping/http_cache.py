@@ -0,0 +1,188 @@
+import os
+import json
+import gzip
+import time
+import uuid
+import hashlib
+import logging
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = 'data/http_cache'
+# Cached pages younger than this are served without contacting the server
+DEFAULT_TTL = 6 * 3600
+# Response headers kept with each page (validators for conditional requests, and the charset)
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Date')
+
+class CacheMiss(requests.RequestException):
+    """Raised in offline mode for a request with no cached response."""
+
+def cache_key(url, params=None):
+    """Key for a GET request: the SHA-256 of its full URL with query parameters in sorted order."""
+    prepared = requests.Request('GET', url, params=sorted((params or {}).items())).prepare()
+    return hashlib.sha256(prepared.url.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    Gzip-compressed raw responses on disk, one file per URL and parameter set.
+    Each file holds a JSON header line (URL, validators, fetch time) followed
+    by the body exactly as received, so pages can be re-parsed later with a
+    different extractor. Files are written to a temporary name and renamed,
+    so concurrent fetch workers never see a partial entry.
+    Args:
+        directory (str): Cache directory
+        ttl (float): Seconds a response is served without revalidation (0 to always revalidate)
+        offline (bool): Replay mode: serve only cached responses, never touch the network
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=DEFAULT_TTL, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.offline = offline
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.gz")
+
+    def load(self, key):
+        """Return (metadata dict, body bytes) for a key, or None if it is not cached."""
+        try:
+            with gzip.open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {key}: {e}")
+            return None
+        header, _, body = data.partition(b'\n')
+        return json.loads(header), body
+
+    def save(self, key, meta, body):
+        """Store a response body with its metadata."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        # mtime=0 keeps the file bytes identical for identical pages
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(json.dumps(meta).encode('utf-8') + b'\n' + body, compresslevel=6, mtime=0))
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, meta):
+        return time.time() - meta['fetched'] < self.ttl
+
+    def stats(self):
+        """Number of cached responses and their total compressed size in bytes."""
+        count = size = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.gz'):
+                    count += 1
+                    size += os.path.getsize(os.path.join(root, name))
+        return {'entries': count, 'bytes': size}
+
+    def prune(self, max_age):
+        """Delete responses fetched more than max_age seconds ago. Returns the number removed."""
+        removed = 0
+        cutoff = time.time() - max_age
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                # A file's mtime is set when its response was last fetched or revalidated
+                if name.endswith('.gz') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+def _cached_response(url, meta, body):
+    """Rebuild a requests.Response from a cache entry."""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = meta['url']
+    response.headers = CaseInsensitiveDict(meta['headers'])
+    response.encoding = meta.get('encoding')
+    response._content = body
+    response.from_cache = True
+    return response
+
+class CachedSession(requests.Session):
+    """
+    Session whose GET requests go through a ResponseCache.
+    Fresh entries are returned without a request. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since, and a 304 answer
+    renews the entry instead of downloading the page again. Only 200
+    responses are cached. Other methods are passed through untouched.
+    Args:
+        cache (ResponseCache): Cache to read and fill
+    """
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+
+    def _serve(self, url, params, entry):
+        if entry and (self.cache.offline or self.cache.is_fresh(entry[0])):
+            self.cache.hits += 1
+            return _cached_response(url, *entry)
+        if self.cache.offline:
+            raise CacheMiss(f"No cached response for {url} {params or ''}".rstrip())
+        return None
+
+    def cached(self, url, params=None):
+        """
+        Return a fresh cached response without touching the network, or None.
+        In offline mode every cached response counts as fresh.
+        Raises:
+            CacheMiss: In offline mode, if the request has never been cached
+        """
+        return self._serve(url, params, self.cache.load(cache_key(url, params)))
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        key = cache_key(url, params)
+        entry = self.cache.load(key)
+        response = self._serve(url, params, entry)
+        if response is not None:
+            return response
+        headers = dict(headers or {})
+        if entry:
+            meta = entry[0]
+            if meta['headers'].get('ETag'):
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if meta['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+        response = super().get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and entry:
+            meta, body = entry
+            meta['fetched'] = time.time()
+            self.cache.save(key, meta, body)
+            self.cache.revalidated += 1
+            return _cached_response(url, meta, body)
+        if response.status_code == 200:
+            meta = {
+                'url': response.url,
+                'headers': {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+                'encoding': response.encoding,
+                'fetched': time.time(),
+            }
+            self.cache.save(key, meta, response.content)
+            self.cache.misses += 1
+        return response
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Inspect or trim the scraper HTTP response cache.')
+    parser.add_argument('command', choices=['stats', 'prune'], help='stats: entries and size; prune: delete old entries')
+    parser.add_argument('--dir', default=CACHE_DIR, help='Cache directory')
+    parser.add_argument('--max-age', type=float, default=7 * 86400, help='prune: seconds since an entry was last fetched')
+    args = parser.parse_args()
+    cache = ResponseCache(args.dir)
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"{stats['entries']} cached responses, {stats['bytes'] / 1e6:.1f} MB compressed")
+    else:
+        print(f"Removed {cache.prune(args.max_age)} cached responses")
@@ -0,0 +1,65 @@
+import logging
+from scraper import iter_ebay_pages
+from sinks import SQLiteSink, ParquetSink, ExcelSink, stream_to_sinks
+from database import init_db, get_job
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def run_scrape_job(query, max_entries=10000, items_per_page=100, max_pages=None, db_name='data/ebay_data.db',
+                   dataset_path='data/products', excel_file=None, extra_sinks=(), write_lock=None,
+                   **fetch_options):
+    """
+    Scrape a query into SQLite and the Parquet dataset, resuming from the job's checkpoint if an earlier run was interrupted.
+    A job that finished last time is crawled again from page 1; unchanged listings are not rewritten.
+    An offline replay (a cache with offline set in fetch_options) always starts at page 1 and
+    leaves the checkpoint alone, since it ends at the first uncached page rather than the last page.
+    Args:
+        query (str): Search keyword
+        max_entries (int): Maximum number of entries for the whole job
+        items_per_page (int): Items per page (max 100)
+        max_pages (int): Result pages to crawl at most (None for no cap)
+        db_name (str): SQLite database path
+        dataset_path (str): Parquet dataset directory, or None to skip it
+        excel_file (str): Optional Excel report path; ignored when resuming, since the
+            report would only hold this run's items
+        extra_sinks (list): Further sinks to stream pages to (closed by the caller)
+        write_lock (threading.Lock): Lock held around each SQLite write, shared by jobs running
+            in parallel on one database
+        **fetch_options: Passed to iter_ebay_pages (concurrency, requests_per_second, ...)
+    Returns:
+        int: Number of items scraped in this run
+    """
+    params = {'max_entries': max_entries, 'items_per_page': items_per_page}
+    if max_pages is not None:
+        # Left out otherwise so checkpoints saved before the page cap existed still match
+        params['max_pages'] = max_pages
+    cache = fetch_options.get('cache')
+    replay = cache is not None and cache.offline
+    conn = init_db(db_name)
+    job = get_job(conn, query, params) if conn and not replay else None
+    if conn:
+        conn.close()
+
+    start_page, start_count = 1, 0
+    resuming = bool(job and job['status'] == 'running')
+    if resuming:
+        start_page, start_count = job['next_page'], job['items_collected']
+        logger.info(f"Resuming '{query}' at page {start_page} ({start_count} items already stored)")
+
+    pages = iter_ebay_pages(query, max_entries, items_per_page, start_page=start_page, start_count=start_count,
+                            raise_errors=True, max_pages=max_pages, **fetch_options)
+    sinks = [SQLiteSink(db_name, job=None if replay else (query, params), start_count=start_count,
+                        write_lock=write_lock)]
+    if dataset_path:
+        sinks.append(ParquetSink(query, dataset_path))
+    if excel_file and resuming:
+        logger.warning(f"Not writing {excel_file}: a resumed run would replace it with only the remaining items")
+    elif excel_file:
+        sinks.append(ExcelSink(excel_file))
+    try:
+        return stream_to_sinks(pages, sinks + list(extra_sinks))
+    finally:
+        for sink in sinks:
+            sink.close()
@@ -0,0 +1,85 @@
+import re
+
+# Currency markers as eBay prints them, longest first so 'AU $' wins over '$'
+CURRENCY_SYMBOLS = [
+    ('AU $', 'AUD'), ('C $', 'CAD'), ('US $', 'USD'),
+    ('GBP', 'GBP'), ('EUR', 'EUR'), ('USD', 'USD'),
+    ('£', 'GBP'), ('€', 'EUR'), ('$', 'USD'),
+]
+CURRENCY_CODES = dict(CURRENCY_SYMBOLS)
+
+TYPED_COLUMNS = ['price_min', 'price_max', 'currency', 'rating_pct', 'review_count', 'sold_count']
+
+# Shared with cleaning.py, which applies them to whole columns
+NUMBER = r'\d[\d,]*(?:\.\d+)?'
+# A price or a range such as '$239.00 to $349.00'
+PRICE_PATTERN = re.compile(rf'(?P<low>{NUMBER})(?:\s*(?:to|-)\s*\D*?(?P<high>{NUMBER}))?')
+# The first currency marker anywhere in the text, e.g. 'approx. £12.99'
+CURRENCY_PATTERN = re.compile('(?P<symbol>' + '|'.join(re.escape(symbol) for symbol, _ in CURRENCY_SYMBOLS) + ')')
+RATING_PATTERN = re.compile(r'(\d+(?:\.\d+)?)%')
+COUNT_PATTERN = re.compile(rf'({NUMBER})\s*([KkMm])?')
+
+def parse_price(price):
+    """
+    Parse a price such as '$20.00', '$239.00 to $349.00' or 'GBP 12.50'.
+    Args:
+        price (str): Raw price text
+    Returns:
+        tuple: (price_min, price_max, currency); Nones when not parseable
+    """
+    if not isinstance(price, str):
+        return None, None, None
+    match = PRICE_PATTERN.search(price)
+    if not match:
+        return None, None, None
+    low = float(match.group('low').replace(',', ''))
+    high = float(match.group('high').replace(',', '')) if match.group('high') else low
+    if price.startswith('$'):
+        currency = 'USD'
+    else:
+        symbol = CURRENCY_PATTERN.search(price)
+        currency = CURRENCY_CODES[symbol.group('symbol')] if symbol else None
+    return min(low, high), max(low, high), currency
+
+def parse_rating(rating):
+    """Extract the seller feedback percentage from e.g. 'seller (3) 100%' or '98.7%'."""
+    if not isinstance(rating, str):
+        return None
+    end = rating.find('%')
+    if end < 0:
+        return None
+    # The percentage is normally the last word before the sign
+    try:
+        return float(rating[:end].rsplit(None, 1)[-1])
+    except (ValueError, IndexError):
+        match = RATING_PATTERN.search(rating)
+        return float(match.group(1)) if match else None
+
+def parse_count(text):
+    """Parse counts such as '1,234', '56 sold' or '10K+' into an integer."""
+    if not isinstance(text, str):
+        return None
+    try:
+        return int(text.replace(',', ''))
+    except ValueError:
+        pass
+    match = COUNT_PATTERN.search(text)
+    if not match:
+        return None
+    value = float(match.group(1).replace(',', ''))
+    multiplier = {'k': 1000, 'm': 1000000}.get((match.group(2) or '').lower(), 1)
+    return int(value * multiplier)
+
+def typed_values(item):
+    """Typed values for a scraped item, in TYPED_COLUMNS order."""
+    price_min, price_max, currency = parse_price(item['price'])
+    return (price_min, price_max, currency, parse_rating(item['rating']),
+            parse_count(item['reviews']), parse_count(item['units_sold']))
+
+def normalize_item(item):
+    """
+    Typed values derived from a scraped item's text fields.
+    Returns:
+        dict: price_min, price_max, currency, rating_pct, review_count, sold_count
+    """
+    return dict(zip(TYPED_COLUMNS, typed_values(item)))
\ No newline at end of file
@@ -1,24 +1,48 @@
-from scraper import scrape_ebay_items
-from database import store_data
-import pandas as pd
+from jobs import run_scrape_job
+from http_cache import ResponseCache, CACHE_DIR, DEFAULT_TTL
+from scheduler import load_queries, crawl_queries, format_report
+import argparse
+import requests
 import os
-     
+
 def main():
+    parser = argparse.ArgumentParser(description='Scrape eBay listings into SQLite and Parquet.')
+    parser.add_argument('--excel', metavar='PATH', help='Also write an Excel report, e.g. data/ebay_data.xlsx (skipped when resuming)')
+    parser.add_argument('--cache', action='store_true', help=f"Keep raw result pages in {CACHE_DIR} and reuse them")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help='Seconds a cached page is reused before it is revalidated with the server')
+    parser.add_argument('--offline', action='store_true',
+                        help='Replay cached pages only (e.g. after changing an extractor), with no network access')
+    parser.add_argument('--queries', metavar='FILE',
+                        help='Crawl every query in FILE (one per line: query[,priority[,max_pages]]) instead of "laptop"')
+    parser.add_argument('--workers', type=int, default=4, help='Queries crawled at the same time with --queries')
+    parser.add_argument('--rps', type=float, default=1.0, help='Requests per second shared by all queries')
+    args = parser.parse_args()
+    cache = ResponseCache(ttl=args.cache_ttl, offline=args.offline) if args.cache or args.offline else None
+
          # Create data directory if it doesn't exist
     if not os.path.exists('data'):
         os.makedirs('data')
-         
-         # Scrape 10,000 entries
-    items = scrape_ebay_items('laptop', max_entries=10000, items_per_page=100)
-         
-    if items:
-             # Store in SQLite
-        store_data(items, db_name='data/ebay_data.db')
-             # Store in Excel
-        pd.DataFrame(items).to_excel('data/ebay_data.xlsx', index=False)
-        print(f"Scraped and stored {len(items)} items")
+
+    if args.queries:
+        report = crawl_queries(load_queries(args.queries), workers=args.workers, requests_per_second=args.rps,
+                               cache=cache)
+        print(format_report(report))
+        return
+
+         # Scrape 10,000 entries, 4 pages in flight at 1 request/second,
+         # storing each page in SQLite and Parquet as soon as it is parsed
+    try:
+        count = run_scrape_job('laptop', max_entries=10000, items_per_page=100, excel_file=args.excel,
+                               concurrency=4, requests_per_second=args.rps, cache=cache)
+    except requests.RequestException as e:
+        print(f"Scrape stopped: {e}. Run again to resume from the last stored page.")
+        return
+
+    if count:
+        print(f"Scraped and stored {count} items")
     else:
         print("No items scraped")
-     
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
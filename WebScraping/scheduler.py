@@ -0,0 +1,133 @@
+import csv
+import time
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from database import init_db
+from jobs import run_scrape_job
+from scraper import RateLimiter
+from sinks import Sink
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class CrawlQuery(namedtuple('CrawlQuery', ['query', 'priority', 'max_pages'])):
+    """A keyword to crawl; higher priorities start first, max_pages (None for no cap) limits its result pages."""
+    __slots__ = ()
+
+    def __new__(cls, query, priority=0, max_pages=None):
+        return super().__new__(cls, query, priority, max_pages)
+
+def load_queries(path):
+    """
+    Read queries from a file, one per line: `query[,priority[,max_pages]]`.
+    Blank lines and lines starting with # are ignored; quote a query that contains a comma.
+    Returns:
+        list: CrawlQuery tuples
+    """
+    queries = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            fields = [field.strip() for field in row]
+            priority = int(fields[1]) if len(fields) > 1 and fields[1] else 0
+            max_pages = int(fields[2]) if len(fields) > 2 and fields[2] else None
+            queries.append(CrawlQuery(fields[0], priority, max_pages))
+    return queries
+
+class StatsSink(Sink):
+    """Count the pages and items a crawl stores, for the throughput report."""
+
+    def __init__(self):
+        self.pages = 0
+        self.items = 0
+
+    def write(self, page, items):
+        self.pages += 1
+        self.items += len(items)
+
+def crawl_queries(queries, workers=4, requests_per_second=1.0, burst=1, items_per_page=100,
+                  max_entries=10000, db_name='data/ebay_data.db', **job_options):
+    """
+    Crawl many queries at once under one request budget.
+    Queries run as resumable scrape jobs (see jobs.run_scrape_job) on a pool of
+    worker threads, highest priority first. Every worker draws from the same
+    rate limiter, so the combined request rate never exceeds
+    requests_per_second, and total crawl time depends on the number of pages,
+    not the number of queries. Workers fetch and parse in parallel but take
+    turns writing to SQLite (one lock around each page's transaction). A query
+    that fails is reported and the rest carry on; running the same list again
+    resumes it.
+    Args:
+        queries (list): CrawlQuery tuples or plain query strings
+        workers (int): Queries crawled at the same time
+        requests_per_second (float): Request budget shared by all queries
+        burst (int): Requests that may be sent back to back
+        items_per_page (int): Items per page (max 100)
+        max_entries (int): Item cap per query (a query's max_pages can end it sooner)
+        db_name (str): SQLite database path
+        **job_options: Passed to run_scrape_job (dataset_path, cache, extractor, ...)
+    Returns:
+        list: Per-query dicts with query, priority, pages, items, seconds, items_per_sec and error
+    """
+    queries = sorted((q if isinstance(q, CrawlQuery) else CrawlQuery(q) for q in queries),
+                     key=lambda q: -q.priority)
+    # Apply schema migrations once, before workers open their own connections
+    conn = init_db(db_name)
+    if conn is None:
+        raise RuntimeError(f"Could not open database {db_name}")
+    conn.close()
+
+    limiter = RateLimiter(requests_per_second, burst)
+    write_lock = threading.Lock()
+    report_lock = threading.Lock()
+    report = []
+
+    def crawl(crawl_query):
+        stats = StatsSink()
+        error = None
+        start = time.perf_counter()
+        try:
+            run_scrape_job(crawl_query.query, max_entries, items_per_page, max_pages=crawl_query.max_pages,
+                           db_name=db_name, extra_sinks=[stats], write_lock=write_lock, limiter=limiter,
+                           **job_options)
+        except Exception as e:
+            # One failed query is reported; the others keep their workers
+            logger.error(f"Crawl of '{crawl_query.query}' stopped: {e}")
+            error = str(e)
+        seconds = time.perf_counter() - start
+        row = {
+            'query': crawl_query.query,
+            'priority': crawl_query.priority,
+            'pages': stats.pages,
+            'items': stats.items,
+            'seconds': round(seconds, 1),
+            'items_per_sec': round(stats.items / seconds, 1) if seconds else 0.0,
+            'error': error,
+        }
+        logger.info(f"Finished '{crawl_query.query}': {stats.pages} pages, {stats.items} items in {seconds:.1f}s")
+        with report_lock:
+            report.append(row)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Submitted in priority order; the pool starts them as workers free up
+        futures = [executor.submit(crawl, crawl_query) for crawl_query in queries]
+        for future in as_completed(futures):
+            future.result()
+    elapsed = time.perf_counter() - start
+    pages = sum(row['pages'] for row in report)
+    logger.info(f"Crawled {len(queries)} queries, {pages} pages in {elapsed:.1f}s "
+                f"({pages / elapsed if elapsed else 0:.2f} pages/sec, budget {requests_per_second}/sec)")
+    return report
+
+def format_report(report):
+    """Render crawl_queries results as a plain-text table."""
+    lines = [f"{'query':<30} {'prio':>4} {'pages':>6} {'items':>7} {'secs':>7} {'items/s':>8}  status"]
+    for row in sorted(report, key=lambda row: (-row['priority'], row['query'])):
+        lines.append(f"{row['query'][:30]:<30} {row['priority']:>4} {row['pages']:>6} {row['items']:>7} "
+                     f"{row['seconds']:>7} {row['items_per_sec']:>8}  {row['error'] or 'ok'}")
+    return '\n'.join(lines)
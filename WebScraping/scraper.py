@@ -1,127 +1,262 @@
 import requests
-from bs4 import BeautifulSoup
 import logging
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import threading
+import math
 import time
+from database import parse_item_id
+from extractors import get_extractor
+from http_cache import CachedSession, CacheMiss
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def create_session_with_retries():
-    """Create a requests session with retry logic."""
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=2, status_forcelist=[429, 500, 502, 503, 504])
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+BASE_URL = 'https://www.ebay.com/sch/i.html'
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5'
+}
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter shared by all fetch workers, one bucket per host.
+    Args:
+        requests_per_second (float): Sustained request rate allowed per host
+        burst (int): Number of requests that may be sent back to back
+    """
+
+    def __init__(self, requests_per_second=1 / 3, burst=1):
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        self.rate = requests_per_second
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._buckets = {}  # host -> [tokens, last_refill, blocked_until]
+
+    def acquire(self, host):
+        """Block until a request to host is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                bucket = self._buckets.setdefault(host, [self.burst, now, 0.0])
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if now < bucket[2]:
+                    wait = bucket[2] - now
+                elif bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                else:
+                    wait = (1 - bucket[0]) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, host, seconds):
+        """Stop every worker from sending to host for the given number of seconds."""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(host, [self.burst, now, 0.0])
+            bucket[2] = max(bucket[2], now + seconds)
+            # Drain the bucket so workers resume at the steady rate, not in a burst
+            bucket[0] = 0
+        logger.warning(f"Backing off {host} for {seconds:.1f} seconds")
+
+def parse_retry_after(value, default=30):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+def create_session_with_retries(status_forcelist=(429, 500, 502, 503, 504), pool_maxsize=10, cache=None):
+    """
+    Create a requests session with retry logic.
+    Args:
+        status_forcelist (tuple): Status codes retried by the adapter
+        pool_maxsize (int): Connections kept open per host
+        cache (ResponseCache): Optional on-disk response cache for GET requests (see http_cache.py)
+    """
+    session = CachedSession(cache) if cache else requests.Session()
+    retries = Retry(total=3, backoff_factor=2, status_forcelist=list(status_forcelist))
+    session.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize))
     return session
 
-def scrape_ebay_items(query, max_entries=10000, items_per_page=100):
+def fetch_page(session, limiter, params, url=BASE_URL, headers=HEADERS, timeout=10, max_retries=5):
     """
-    Scrape eBay search results for items.
+    Fetch one result page through the shared rate limiter.
+    A 429 response or DNS failure pauses the whole host, not just this worker.
+    Pages served fresh from a session's response cache skip the limiter.
+    Args:
+        session (requests.Session): Session used for the request
+        limiter (RateLimiter): Limiter shared by all workers
+        params (dict): Query parameters for the page
+        max_retries (int): Attempts before giving up on the page
+    Returns:
+        str: Page HTML
+    """
+    if isinstance(session, CachedSession):
+        response = session.cached(url, params)
+        if response is not None:
+            return response.text
+    host = urlparse(url).netloc
+    for attempt in range(1, max_retries + 1):
+        limiter.acquire(host)
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except requests.ConnectionError as e:
+            if "Temporary failure in name resolution" in str(e) and attempt < max_retries:
+                logger.warning("DNS resolution error. Retrying after 10 seconds...")
+                limiter.backoff(host, 10)
+                continue
+            raise
+        if response.status_code == 429 and attempt < max_retries:
+            limiter.backoff(host, parse_retry_after(response.headers.get('Retry-After')))
+            continue
+        response.raise_for_status()
+        return response.text
+    raise requests.RequestException(f"Giving up on page {params.get('_pgn')} after {max_retries} attempts")
+
+def parse_page(html, extractor=None):
+    """
+    Parse a search result page.
+    Args:
+        html (str): Page HTML
+        extractor (Extractor): Extraction engine (defaults to the fastest installed)
+    Returns:
+        tuple: (list of item dictionaries, whether a next page exists)
+    """
+    return (extractor or get_extractor()).parse(html)
+
+def iter_ebay_pages(query, max_entries=10000, items_per_page=100, concurrency=1,
+                    requests_per_second=1 / 3, limiter=None, extractor=None,
+                    start_page=1, start_count=0, raise_errors=False, cache=None, dedupe=True, max_pages=None):
+    """
+    Scrape eBay search results one page at a time.
+    Up to `concurrency` pages are fetched ahead while results are yielded in
+    page order, so the output and the max_entries cutoff match a serial crawl.
+    No page is fetched ahead past the last one max_entries could need, and
+    nothing is fetched after a page without a next link.
+    Only the current page is held in memory. Listings repeated on a later page
+    are dropped before they count toward max_entries, so the cutoff and the
+    items stored agree.
     Args:
         query (str): Search keyword (e.g., 'laptop')
         max_entries (int): Maximum number of entries to scrape
         items_per_page (int): Items per page (max 100)
-    Returns:
-        list: List of dictionaries with item details
+        concurrency (int): Number of pages kept in flight
+        requests_per_second (float): Request budget per host (ignored if limiter is given)
+        limiter (RateLimiter): Optional limiter shared with other crawls
+        extractor (Extractor): Extraction engine (defaults to the fastest installed)
+        start_page (int): First page to fetch, for resuming a checkpointed job
+        start_count (int): Items already collected toward max_entries by earlier runs
+        raise_errors (bool): Raise fetch errors instead of ending the crawl quietly
+        cache (ResponseCache): Response cache; with cache.offline set, cached pages are
+            replayed without network access and the crawl ends at the first uncached page
+        dedupe (bool): Drop listings already yielded in this run (result pages overlap)
+        max_pages (int): Fetch no page past this one (None for no cap); counted from page 1,
+            so a resumed crawl keeps the same cap
+    Yields:
+        tuple: (page number, list of item dictionaries on that page)
     """
-    base_url = 'https://www.ebay.com/sch/i.html'
-    session = create_session_with_retries()
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5'
-    }
-    
-    results = []
-    page = 1
-    items_collected = 0
-    
-    while items_collected < max_entries:
+    limiter = limiter or RateLimiter(requests_per_second)
+    extractor = extractor or get_extractor()
+    logger.info(f"Using {extractor.name} extractor")
+    session = create_session_with_retries(status_forcelist=(500, 502, 503, 504), pool_maxsize=max(10, concurrency),
+                                          cache=cache)
+
+    items_collected = start_count
+    seen = set()
+    page = start_page
+    next_to_submit = start_page
+    pending = {}
+
+    def submit(executor, page_number):
         params = {
             '_nkw': query,
             '_sacat': 0,
             '_ipg': items_per_page,
-            '_pgn': page
+            '_pgn': page_number
         }
-        
+        logger.info(f"Fetching page {page_number} for query: {query}")
+        return executor.submit(fetch_page, session, limiter, params)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
         try:
-            logger.info(f"Fetching page {page} for query: {query}")
-            time.sleep(3)  # Delay to avoid rate limiting
-            response = session.get(base_url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            logger.info(f"Successfully fetched page {page}")
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            items = soup.find_all('div', class_='s-item__wrapper')
-            if not items:
-                logger.warning(f"No items found on page {page}. Stopping.")
-                break
-            
-            for item in items:
-                if items_collected >= max_entries:
+            while items_collected < max_entries and (max_pages is None or page <= max_pages):
+                # Keep the window of in-flight pages full, but only with pages that can still be
+                # needed: if every page from here on is full, max_entries is reached at last_page
+                last_page = page + math.ceil((max_entries - items_collected) / items_per_page) - 1
+                if max_pages is not None:
+                    last_page = min(last_page, max_pages)
+                while len(pending) < concurrency and next_to_submit <= last_page:
+                    pending[next_to_submit] = submit(executor, next_to_submit)
+                    next_to_submit += 1
+
+                try:
+                    html = pending.pop(page).result()
+                except CacheMiss:
+                    logger.info(f"Page {page} is not cached. Replay finished.")
                     break
-                
-                # Extract title
-                title_tag = item.find('div', class_='s-item__title')
-                title = title_tag.text.strip() if title_tag else 'N/A'
-                
-                # Extract price
-                price_tag = item.find('span', class_='s-item__price')
-                price = price_tag.text.strip() if price_tag else 'N/A'
-                
-                # Extract URL
-                url_tag = item.find('a', class_='s-item__link')
-                url = url_tag['href'] if url_tag else 'N/A'
-                
-                # Extract description (limited in search results, may need item page)
-                desc_tag = item.find('div', class_='s-item__subtitle')
-                description = desc_tag.text.strip() if desc_tag else 'N/A'
-                
-                # Extract reviews
-                reviews_tag = item.find('span', class_='s-item__reviews-count')
-                reviews = reviews_tag.text.strip().split()[0] if reviews_tag else 'N/A'
-                
-                # Extract star rating
-                rating_tag = item.find('span', class_='s-item__seller-info-text')
-                rating = rating_tag.text.strip() if rating_tag else 'N/A'
-                
-                # Extract location
-                location_tag = item.find('span', class_='s-item__location')
-                location = location_tag.text.strip().replace('from ', '') if location_tag else 'N/A'
-                
-                # Extract units sold
-                sold_tag = item.find('span', class_='s-item__quantity-sold')
-                units_sold = sold_tag.text.strip().split()[0] if sold_tag else 'N/A'
-                
-                results.append({
-                    'title': title,
-                    'price': price,
-                    'url': url,
-                    'description': description,
-                    'reviews': reviews,
-                    'rating': rating,
-                    'location': location,
-                    'units_sold': units_sold
-                })
-                
-                items_collected += 1
-            
-            logger.info(f"Collected {items_collected} items so far")
-            page += 1
-            
-            next_page = soup.find('a', class_='pagination__next')
-            if not next_page or 'disabled' in next_page.get('class', []):
-                logger.info("No more pages available.")
-                break
-            
-        except requests.RequestException as e:
-            logger.error(f"Error fetching page {page}: {e}")
-            if "Temporary failure in name resolution" in str(e):
-                logger.warning("DNS resolution error. Retrying after 10 seconds...")
-                time.sleep(10)
-                continue
-            break
-    
-    return results
\ No newline at end of file
+                except requests.RequestException as e:
+                    logger.error(f"Error fetching page {page}: {e}")
+                    if raise_errors:
+                        raise
+                    break
+                logger.info(f"Successfully fetched page {page}")
+
+                items, has_next = parse_page(html, extractor)
+                if not items:
+                    logger.warning(f"No items found on page {page}. Stopping.")
+                    break
+
+                if dedupe:
+                    unique = []
+                    for item in items:
+                        item_id = parse_item_id(item['url'])
+                        if item_id is None or item_id not in seen:
+                            seen.add(item_id)
+                            unique.append(item)
+                    if len(unique) < len(items):
+                        logger.info(f"Skipped {len(items) - len(unique)} duplicate listings on page {page}")
+                    items = unique
+
+                items = items[:max_entries - items_collected]
+                items_collected += len(items)
+                logger.info(f"Collected {items_collected} items so far")
+                yield page, items
+                page += 1
+
+                if not has_next:
+                    logger.info("No more pages available.")
+                    break
+        finally:
+            # Pages fetched past the stopping point are discarded
+            for future in pending.values():
+                future.cancel()
+            if cache:
+                logger.info(f"Response cache: {cache.hits} hits, {cache.revalidated} revalidated, "
+                            f"{cache.misses} downloaded")
+
+def scrape_ebay_items(query, max_entries=10000, items_per_page=100, **kwargs):
+    """
+    Scrape eBay search results for items.
+    Args:
+        query (str): Search keyword (e.g., 'laptop')
+        max_entries (int): Maximum number of entries to scrape
+        items_per_page (int): Items per page (max 100)
+        **kwargs: Fetch options passed to iter_ebay_pages
+    Returns:
+        list: List of dictionaries with item details
+    """
+    return [item for _, items in iter_ebay_pages(query, max_entries, items_per_page, **kwargs) for item in items]
\ No newline at end of file
@@ -0,0 +1,172 @@
+import logging
+import os
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from datetime import datetime
+from database import init_db, insert_items, parse_item_id, save_checkpoint, TEXT_COLUMNS
+from normalize import TYPED_COLUMNS, typed_values
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class Sink(ABC):
+    """Destination for scraped items, written one page batch at a time."""
+
+    @abstractmethod
+    def write(self, page, items):
+        """Store one page's items."""
+
+    def finish(self):
+        """Called once the crawl has run to completion."""
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class SQLiteSink(Sink):
+    """
+    Upsert each page into the products table and commit it immediately.
+    With a job, the page cursor is committed in the same transaction, so a
+    resumed run starts exactly after the last stored page.
+    Args:
+        db_name (str): SQLite database path
+        job (tuple): Optional (query, params) identifying the scrape job
+        start_count (int): Items the job had already collected before this run
+        write_lock (threading.Lock): Held for each write transaction, so sinks
+            in different threads write to the same database one at a time
+    """
+
+    def __init__(self, db_name='data/ebay_data.db', job=None, start_count=0, write_lock=None):
+        self.conn = init_db(db_name)
+        if not self.conn:
+            raise RuntimeError(f"Could not open database {db_name}")
+        self.job = job
+        self.items_collected = start_count
+        self.next_page = None
+        self.changed = 0
+        self.write_lock = write_lock or nullcontext()
+
+    def write(self, page, items):
+        with self.write_lock:
+            self.changed += insert_items(self.conn, items)
+            self.items_collected += len(items)
+            self.next_page = page + 1
+            if self.job:
+                save_checkpoint(self.conn, *self.job, self.next_page, self.items_collected)
+            self.conn.commit()
+
+    def finish(self):
+        if self.job and self.next_page is not None:
+            with self.write_lock:
+                save_checkpoint(self.conn, *self.job, self.next_page, self.items_collected, status='done')
+                self.conn.commit()
+        logger.info(f"{self.changed} listings were new or changed")
+
+    def close(self):
+        self.conn.close()
+
+class ExcelSink(Sink):
+    """
+    Stream rows into an .xlsx file with openpyxl's write-only mode.
+    Memory stays constant, but the file is only written on close, so SQLite
+    remains the durable copy if the run is killed.
+    """
+
+    def __init__(self, path='data/ebay_data.xlsx'):
+        from openpyxl import Workbook
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.columns = None
+
+    def write(self, page, items):
+        for item in items:
+            if self.columns is None:
+                self.columns = list(item)
+                self.sheet.append(self.columns)
+            self.sheet.append([item[column] for column in self.columns])
+
+    def close(self):
+        if self.columns is None:
+            # Nothing was written; keep any earlier report rather than replacing it with an empty one
+            logger.info(f"No rows for {self.path}; not saving")
+            return
+        tmp_path = self.path + '.tmp'
+        self.workbook.save(tmp_path)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved Excel output to {self.path}")
+
+class ParquetSink(Sink):
+    """
+    Write items with typed columns to a Parquet dataset partitioned by query and date.
+    Rows are buffered and written as a new part file every rows_per_file rows,
+    so memory stays bounded and finished parts survive a killed run.
+    Args:
+        query (str): Search keyword, used as the query partition
+        dataset_path (str): Dataset root directory
+        rows_per_file (int): Rows buffered before a part file is written
+    """
+
+    def __init__(self, query, dataset_path='data/products', rows_per_file=10000):
+        from storage import PRODUCT_SCHEMA
+        self.schema = PRODUCT_SCHEMA
+        self.query = query
+        self.dataset_path = dataset_path
+        self.rows_per_file = rows_per_file
+        self.date = datetime.now().strftime('%Y-%m-%d')
+        self.run_id = uuid.uuid4().hex[:12]
+        self.part = 0
+        self.rows = []
+
+    def write(self, page, items):
+        scraped_at = datetime.now().replace(microsecond=0)
+        for item in items:
+            row = {column: item[column] for column in TEXT_COLUMNS}
+            row.update(zip(TYPED_COLUMNS, typed_values(item)))
+            row['item_id'] = parse_item_id(item['url'])
+            row['scraped_at'] = scraped_at
+            self.rows.append(row)
+        if len(self.rows) >= self.rows_per_file:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        import pyarrow as pa
+        from storage import write_part
+        table = pa.Table.from_pylist(self.rows, schema=self.schema)
+        path = write_part(table, self.dataset_path, self.query, self.date, f"part-{self.run_id}-{self.part:05d}.parquet")
+        logger.info(f"Wrote {len(self.rows)} rows to {path}")
+        self.part += 1
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+def stream_to_sinks(pages, sinks):
+    """
+    Write page batches to every sink as they arrive.
+    Args:
+        pages (iterable): (page number, items) tuples, e.g. from iter_ebay_pages
+            (which drops listings repeated across pages)
+        sinks (list): Sink instances
+    Returns:
+        int: Number of items written
+    """
+    total = 0
+    for page, items in pages:
+        for sink in sinks:
+            sink.write(page, items)
+        total += len(items)
+        logger.info(f"Persisted page {page} ({total} items total)")
+    for sink in sinks:
+        sink.finish()
+    return total
\ No newline at end of file
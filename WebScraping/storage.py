@@ -0,0 +1,137 @@
+import logging
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from urllib.parse import quote
+from normalize import TYPED_COLUMNS, normalize_item
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DATASET_PATH = 'data/products'
+ARROW_PATH = 'data/ebay_data.arrow'
+# Read when there is no Parquet dataset yet (e.g. a checkout with only the original report)
+EXCEL_PATH = 'data/ebay_data.xlsx'
+# Raw text fields the typed columns are parsed from
+TYPED_SOURCE_COLUMNS = ['price', 'rating', 'reviews', 'units_sold']
+
+# Columns written to Parquet; query and date are hive partition directories
+PRODUCT_SCHEMA = pa.schema([
+    ('item_id', pa.string()),
+    ('title', pa.string()),
+    ('price', pa.string()),
+    ('url', pa.string()),
+    ('description', pa.string()),
+    ('reviews', pa.string()),
+    ('rating', pa.string()),
+    ('location', pa.string()),
+    ('units_sold', pa.string()),
+    ('price_min', pa.float64()),
+    ('price_max', pa.float64()),
+    ('currency', pa.string()),
+    ('rating_pct', pa.float64()),
+    ('review_count', pa.int64()),
+    ('sold_count', pa.int64()),
+    ('scraped_at', pa.timestamp('s')),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('query', pa.string()), ('date', pa.string())]), flavor='hive')
+
+def _read_excel(path, columns):
+    """Read an Excel report, parsing typed columns from the raw text when they are requested."""
+    typed = [column for column in columns or [] if column in TYPED_COLUMNS]
+    if not typed:
+        return pd.read_excel(path, usecols=columns)
+    raw = [column for column in columns if column not in TYPED_COLUMNS]
+    df = pd.read_excel(path, usecols=list(dict.fromkeys(raw + TYPED_SOURCE_COLUMNS)))
+    text = df[TYPED_SOURCE_COLUMNS].astype(object).where(df[TYPED_SOURCE_COLUMNS].notna(), None)
+    values = pd.DataFrame([normalize_item(item) for item in text.to_dict('records')], index=df.index,
+                          columns=TYPED_COLUMNS)
+    return pd.concat([df, values], axis=1)[columns]
+
+def _latest_per_item(df):
+    """Keep the most recent row for each item_id; the dataset gains a row every time a listing is scraped."""
+    df = df.sort_values('scraped_at', kind='stable')
+    keep = df['item_id'].isna() | ~df.duplicated('item_id', keep='last')
+    return df[keep].sort_index().reset_index(drop=True)
+
+def load_products(path=None, columns=None, row_filter=None, latest=True):
+    """
+    Load products from a Parquet dataset directory, an Arrow IPC file or an Excel report.
+    Parquet and Arrow only read the requested columns; Arrow files are memory-mapped.
+    Args:
+        path (str): Dataset directory, .arrow file or .xlsx file (defaults to the
+            Parquet dataset, or the Excel report if no dataset has been written)
+        columns (list): Columns to load (all if None); may include query and date
+        row_filter (pyarrow.compute.Expression): Row filter, e.g. ds.field('query') == 'laptop'
+            (Parquet and Arrow only)
+        latest (bool): Parquet and Arrow only: return each item once, as last
+            scraped, rather than one row per crawl that saw it
+    Returns:
+        pd.DataFrame: Products
+    """
+    if path is None:
+        path = DATASET_PATH if os.path.isdir(DATASET_PATH) else EXCEL_PATH
+    if path.endswith('.xlsx'):
+        df = _read_excel(path, columns)
+        logger.info(f"Loaded {len(df)} rows ({', '.join(df.columns)}) from {path}")
+        return df
+    # Deduplication needs the item ID and scrape time even if they weren't asked for
+    read_columns = columns
+    if latest and columns is not None:
+        read_columns = list(dict.fromkeys(columns + ['item_id', 'scraped_at']))
+    if path.endswith('.arrow'):
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+            if read_columns:
+                table = table.select(read_columns)
+            if row_filter is not None:
+                table = table.filter(row_filter)
+            df = table.to_pandas()
+    else:
+        dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+        df = dataset.to_table(columns=read_columns, filter=row_filter).to_pandas()
+    if latest:
+        rows = len(df)
+        df = _latest_per_item(df)
+        if columns is not None:
+            df = df[columns]
+        logger.info(f"Kept the latest of {rows} rows for each item")
+    logger.info(f"Loaded {len(df)} rows ({', '.join(df.columns)}) from {path}")
+    return df
+
+def export_arrow(dataset_path=DATASET_PATH, arrow_path=ARROW_PATH):
+    """Consolidate the Parquet dataset into one Arrow IPC file that readers can memory-map."""
+    dataset = ds.dataset(dataset_path, format='parquet', partitioning=PARTITIONING)
+    tmp_path = arrow_path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, dataset.schema) as writer:
+            for batch in dataset.to_batches():
+                writer.write_batch(batch)
+    os.replace(tmp_path, arrow_path)
+    logger.info(f"Exported {dataset_path} to {arrow_path}")
+
+def write_part(table, dataset_path, query, date, name):
+    """Write one Parquet file into the query/date partition of the dataset."""
+    # Partition values are URI-encoded, which the hive partitioning decodes on read
+    directory = os.path.join(dataset_path, f"query={quote(query, safe='')}", f"date={date}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    # Dot-prefixed files are ignored by dataset discovery until renamed
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Columnar export utilities.')
+    parser.add_argument('command', choices=['to-arrow'], help='to-arrow: write the Parquet dataset to one Arrow IPC file')
+    parser.add_argument('--dataset', default=DATASET_PATH, help='Parquet dataset directory')
+    parser.add_argument('--arrow', default=ARROW_PATH, help='Arrow IPC output path')
+    args = parser.parse_args()
+    if args.command == 'to-arrow':
+        export_arrow(args.dataset, args.arrow)
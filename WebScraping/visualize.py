@@ -3,7 +3,13 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import os
 import sys
+import json
+import hashlib
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from cleaning import clean_frame, price_by_location
+from database import init_db, rating_histogram, RATING_BIN_SCALE, price_by_location as db_price_by_location
+from storage import load_products, EXCEL_PATH
 
 # Set Matplotlib backend to Agg for non-interactive environments
 plt.switch_backend('Agg')
@@ -19,40 +25,172 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def clean_price(price):
-    """Convert price string to float, handling ranges and currencies."""
-    try:
-        if not isinstance(price, str):
-            logger.warning(f"Invalid price type: {type(price)} - {price}")
-            return None
-        price = price.replace('$', '').replace(',', '').strip()
-        if '-' in price:
-            price = price.split('-')[0].strip()
-        return float(price)
-    except (ValueError, AttributeError) as e:
-        logger.warning(f"Failed to clean price '{price}': {e}")
-        return None
+DB_PATH = 'data/ebay_data.db'
+# Bump when a chart's styling changes so cached images are redrawn
+CHART_STYLE_VERSION = 1
+# Data versions of the images in an output directory
+MANIFEST_NAME = 'charts.json'
+MIN_RATINGS = 10  # Require at least 10 valid ratings for the histogram
+
+def load_chart_data(data_path):
+    """
+    Read the aggregates the charts plot.
+    A SQLite database is read from its materialized aggregate tables, which
+    ingest keeps up to date, so no product rows are scanned. The Parquet
+    dataset, an Arrow IPC file or an Excel report is loaded and aggregated.
+    Args:
+        data_path (str): ebay_data.db, the Parquet dataset directory, an .arrow file or an .xlsx report
+    Returns:
+        dict: 'locations' as (location, listings, mean, median) tuples, highest mean first,
+              and 'ratings' as (rating percentage, listings) tuples
+    """
+    if data_path.endswith('.db'):
+        conn = init_db(data_path)
+        if conn is None:
+            raise RuntimeError(f"Could not open database {data_path}")
+        try:
+            if conn.execute('SELECT 1 FROM products LIMIT 1').fetchone() is None:
+                raise ValueError("Data contains no rows")
+            return {'locations': db_price_by_location(conn), 'ratings': rating_histogram(conn)}
+        finally:
+            conn.close()
+
+    # Read only the columns the plots need
+    if data_path.endswith('.xlsx'):
+        # Excel reports hold raw text; clean price and rating for whole columns at once
+        df = load_products(data_path, columns=['price', 'rating', 'location'])
+        df, invalid = clean_frame(df)
+        logger.info(f"Unparseable values: {invalid['price']} prices, {invalid['rating']} ratings")
+    else:
+        # Columnar exports already carry typed columns
+        df = load_products(data_path, columns=['location', 'price_min', 'currency', 'rating_pct'])
+        df = df.rename(columns={'price_min': 'price_numeric', 'rating_pct': 'rating_numeric'})
+    if df.empty:
+        logger.error("DataFrame is empty")
+        raise ValueError("Data contains no rows")
+    logger.info(f"Loaded DataFrame with {len(df)} rows and columns: {list(df.columns)}")
+    locations = price_by_location(df)
+    ratings = (df['rating_numeric'].dropna() * RATING_BIN_SCALE).round() / RATING_BIN_SCALE
+    ratings = ratings.value_counts().sort_index()
+    return {
+        'locations': [(location, int(row['count']), row['mean'], row['median']) for location, row in locations.iterrows()],
+        'ratings': [(float(rating), int(count)) for rating, count in ratings.items()],
+    }
+
+def _check_saved(path, description):
+    if os.path.exists(path):
+        file_size = os.path.getsize(path)
+        logger.info(f"Successfully saved {description} plot to {path} (size: {file_size} bytes)")
+    else:
+        logger.error(f"Failed to save {description} plot at {path}")
+        raise RuntimeError(f"{description.capitalize()} plot not created at {path}")
+
+def render_price_trend(locations, path):
+    """Bar chart of average price for the (location, mean) pairs, as ordered."""
+    logger.info("Generating average price by location plot")
+    plt.figure(figsize=(12, 6))
+    sns.barplot(x=[mean for _, mean in locations], y=[location for location, _ in locations])
+    plt.title('Average Price by Location (Top 10)')
+    plt.xlabel('Average Price (USD)')
+    plt.ylabel('Location')
+    plt.savefig(path, bbox_inches='tight')
+    plt.close()
+    _check_saved(path, 'price trend')
 
-def clean_rating(rating):
-    """Extract percentage from rating string."""
+def render_rating_distribution(ratings, path):
+    """Histogram (20 bins) of (rating, listings) pairs, or a placeholder if there are too few ratings."""
+    logger.info("Generating rating distribution plot")
+    valid_ratings = sum(count for _, count in ratings)
+    plt.figure(figsize=(10, 6))
+    if valid_ratings < MIN_RATINGS:
+        logger.error(f"Insufficient valid ratings ({valid_ratings}) for histogram")
+        plt.text(0.5, 0.5, 'Insufficient valid ratings available', ha='center', va='center')
+    else:
+        sns.histplot(x=[rating for rating, _ in ratings], weights=[count for _, count in ratings], bins=20)
+        plt.title('Distribution of Seller Ratings')
+        plt.xlabel('Rating (%)')
+        plt.ylabel('Count')
+    plt.savefig(path, bbox_inches='tight')
+    plt.close()
+    _check_saved(path, 'rating distribution')
+
+CHARTS = {
+    'price_trend.png': render_price_trend,
+    'rating_distribution.png': render_rating_distribution,
+}
+
+def chart_version(name, data):
+    """Data version of a chart: a digest of exactly what it plots, plus the chart style version."""
+    payload = json.dumps([name, CHART_STYLE_VERSION, data], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_charts(chart_data, output_dir, workers=None):
+    """
+    Render charts whose data changed since they were last drawn.
+    Each image's data version is kept in output_dir/charts.json; an image
+    whose version is unchanged is left alone. Stale charts are independent,
+    so when more than one needs drawing they render in parallel processes.
+    Args:
+        chart_data (dict): Chart file name -> data passed to its renderer in CHARTS
+        output_dir (str): Directory for the images
+        workers (int): Maximum rendering processes (1 renders in this process)
+    Returns:
+        dict: Chart file name -> 'cached' or 'rendered'
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
     try:
-        if not isinstance(rating, str):
-            return None
-        # Handle formats like '98.7%' or 'sambasaturne (3) 100%'
-        match = pd.Series([rating]).str.extract(r'(\d+\.\d+)%')[0].iloc[0]
-        return float(match) if pd.notna(match) else None
-    except (ValueError, AttributeError) as e:
-        logger.warning(f"Failed to clean rating '{rating}': {e}")
-        return None
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    status = {}
+    stale = {}
+    for name, data in chart_data.items():
+        version = chart_version(name, data)
+        if manifest.get(name) == version and os.path.exists(os.path.join(output_dir, name)):
+            logger.info(f"{name} is up to date")
+            status[name] = 'cached'
+        else:
+            stale[name] = version
 
-def visualize_data(excel_file='data/ebay_data.xlsx', output_dir='visualizations'):
-    """Generate visualizations for price trends and rating distributions, stopping on failure."""
-    logger.info(f"Starting visualization with excel_file: {excel_file}, output_dir: {output_dir}")
+    workers = min(len(stale), workers or os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(CHARTS[name], chart_data[name], os.path.join(output_dir, name))
+                       for name in stale}
+            for future in futures.values():
+                future.result()
+    else:
+        for name in stale:
+            CHARTS[name](chart_data[name], os.path.join(output_dir, name))
+    for name, version in stale.items():
+        manifest[name] = version
+        status[name] = 'rendered'
+
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return status
+
+def visualize_data(data_path=None, output_dir='visualizations', workers=None):
+    """
+    Generate visualizations for price trends and rating distributions, stopping on failure.
+    data_path may be the SQLite database (read from its materialized aggregates),
+    the Parquet dataset directory, an Arrow IPC file or an Excel report; by
+    default it is the database, or the Excel report if nothing has been scraped
+    into SQLite yet.
+    Charts whose data has not changed since the last run are not redrawn.
+    """
+    if data_path is None:
+        data_path = DB_PATH if os.path.exists(DB_PATH) else EXCEL_PATH
+    logger.info(f"Starting visualization with data_path: {data_path}, output_dir: {output_dir}")
     
-    # Check if Excel file exists
-    if not os.path.exists(excel_file):
-        logger.error(f"Excel file '{excel_file}' does not exist")
-        raise FileNotFoundError(f"Excel file '{excel_file}' not found. Run run_scraper.py first.")
+    # Check if the data exists
+    if not os.path.exists(data_path):
+        logger.error(f"Data '{data_path}' does not exist")
+        raise FileNotFoundError(f"Data '{data_path}' not found. Run run_scraper.py first.")
     
     # Create output directory
     try:
@@ -64,81 +202,19 @@ def visualize_data(excel_file='data/ebay_data.xlsx', output_dir='visualizations'
         raise OSError(f"Cannot create output directory: {e}")
     
     try:
-        # Read Excel file
-        logger.info(f"Reading Excel file: {excel_file}")
-        df = pd.read_excel(excel_file)
-        if df.empty:
-            logger.error("DataFrame is empty")
-            raise ValueError("Excel file contains no data")
-        logger.info(f"Loaded DataFrame with {len(df)} rows and columns: {list(df.columns)}")
-        
-        # Log sample data
-        logger.info(f"Sample data (first 5 rows):\n{df.head().to_string()}")
-        
-        # Clean price data
-        logger.info("Cleaning price data")
-        df['price_numeric'] = df['price'].apply(clean_price)
-        valid_prices = df['price_numeric'].notna().sum()
-        logger.info(f"Valid price_numeric entries: {valid_prices}")
+        logger.info(f"Reading data: {data_path}")
+        data = load_chart_data(data_path)
+        valid_prices = sum(listings for _, listings, _, _ in data['locations'])
+        logger.info(f"Valid prices in the top locations: {valid_prices}")
         if valid_prices == 0:
-            logger.error("No valid price_numeric values after cleaning")
+            logger.error("No valid prices available for plotting")
             raise ValueError("No valid prices available for plotting")
-        df = df.dropna(subset=['price_numeric'])
-        logger.info(f"After price cleaning, DataFrame has {len(df)} rows")
-        
-        # Plot 1: Average price by location
-        logger.info("Generating average price by location plot")
-        avg_price_by_location = df.groupby('location')['price_numeric'].mean().sort_values(ascending=False)[:10]
-        if avg_price_by_location.empty:
-            logger.error("No valid data for average price by location")
-            raise ValueError("No valid location data for price plot")
-        plt.figure(figsize=(12, 6))
-        sns.barplot(x=avg_price_by_location.values, y=avg_price_by_location.index)
-        plt.title('Average Price by Location (Top 10)')
-        plt.xlabel('Average Price ($)')
-        plt.ylabel('Location')
-        price_plot_path = os.path.join(output_dir, 'price_trend.png')
-        plt.savefig(price_plot_path, bbox_inches='tight')
-        plt.close()
-        if os.path.exists(price_plot_path):
-            file_size = os.path.getsize(price_plot_path)
-            logger.info(f"Successfully saved price trend plot to {price_plot_path} (size: {file_size} bytes)")
-        else:
-            logger.error(f"Failed to save price trend plot at {price_plot_path}")
-            raise RuntimeError(f"Price trend plot not created at {price_plot_path}")
-        
-        # Clean rating data
-        logger.info("Cleaning rating data")
-        df['rating_numeric'] = df['rating'].apply(clean_rating)
-        valid_ratings = df['rating_numeric'].notna().sum()
-        logger.info(f"Valid rating_numeric entries: {valid_ratings}")
-        
-        # Plot 2: Rating distribution
-        logger.info("Generating rating distribution plot")
-        if valid_ratings < 10:  # Require at least 10 valid ratings
-            logger.error(f"Insufficient valid ratings ({valid_ratings}) for histogram")
-            plt.figure(figsize=(10, 6))
-            plt.text(0.5, 0.5, 'Insufficient valid ratings available', ha='center', va='center')
-            plt.savefig(os.path.join(output_dir, 'rating_distribution.png'), bbox_inches='tight')
-            plt.close()
-            logger.info(f"Saved placeholder rating distribution plot to {output_dir}/rating_distribution.png")
-        else:
-            plt.figure(figsize=(10, 6))
-            sns.histplot(df['rating_numeric'].dropna(), bins=20)
-            plt.title('Distribution of Seller Ratings')
-            plt.xlabel('Rating (%)')
-            plt.ylabel('Count')
-            rating_plot_path = os.path.join(output_dir, 'rating_distribution.png')
-            plt.savefig(rating_plot_path, bbox_inches='tight')
-            plt.close()
-            if os.path.exists(rating_plot_path):
-                file_size = os.path.getsize(rating_plot_path)
-                logger.info(f"Successfully saved rating distribution plot to {rating_plot_path} (size: {file_size} bytes)")
-            else:
-                logger.error(f"Failed to save rating distribution plot at {rating_plot_path}")
-                raise RuntimeError(f"Rating distribution plot not created at {rating_plot_path}")
         
-        logger.info("Visualization completed successfully")
+        status = render_charts({
+            'price_trend.png': [(location, mean) for location, _, mean, _ in data['locations']],
+            'rating_distribution.png': data['ratings'],
+        }, output_dir, workers)
+        logger.info(f"Visualization completed successfully: {status}")
         return True
     
     except Exception as e:
@@ -156,4 +232,4 @@ if __name__ == '__main__':
             sys.exit(1)
     except Exception as e:
         logger.error(f"Program terminated due to error: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
\ No newline at end of file
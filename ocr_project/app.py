@@ -1,99 +1,334 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file
-from ocr_processor import extract_text
-from database import store_ocr_result, get_all_ocr_results
+from flask import Flask, Request, Response, render_template, request, redirect, url_for, jsonify, stream_with_context
+from markupsafe import Markup, escape
+from werkzeug.utils import secure_filename
+from concurrent.futures import ThreadPoolExecutor
+from database import (list_ocr_results, get_ocr_result, get_document, find_ocr_result, iter_ocr_text, clear_results,
+                      search_ocr_results, HIGHLIGHT_START, HIGHLIGHT_END)
+from documents import count_pages, is_document
+from export import FORMATS, export_results, parse_time
+from job_queue import init_queue, enqueue_job, enqueue_document, get_job, queue_counts, start_workers, supervise_workers, QueueFullError
+from ocr_cache import content_hash
 import os
 import sqlite3
 import logging
+import threading
 import io
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class InMemoryRequest(Request):
+    """Request that keeps uploaded files in memory instead of spooling large ones to a temp file."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Bounded by MAX_CONTENT_LENGTH, which Werkzeug enforces before parsing
+        return io.BytesIO()
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 UPLOAD_FOLDER = 'static/uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+# OCR runs in background worker processes, started with the first request (0 when they run
+# separately via `python job_queue.py`); uploads beyond MAX_QUEUED_JOBS are refused
+app.config['OCR_WORKERS'] = int(os.environ.get('OCR_WORKERS', 2))
+app.config['MAX_QUEUED_JOBS'] = int(os.environ.get('MAX_QUEUED_JOBS', 100))
+app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024
+# Keep a copy of each uploaded image in UPLOAD_FOLDER (written off the request path)
+app.config['PERSIST_UPLOADS'] = os.environ.get('PERSIST_UPLOADS', '1') != '0'
+# Results per homepage page; each shows a snippet, with the full text loaded on request
+app.config['RESULTS_PER_PAGE'] = 24
+app.config['SEARCH_RESULTS_PER_PAGE'] = 20
+# TIFF and PDF uploads may have many pages, each OCR'd as its own job
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tif', 'tiff', 'pdf'}
+init_queue()
+persist_executor = ThreadPoolExecutor(max_workers=1)
+workers_lock = threading.Lock()
+workers_started = False
+
+@app.before_request
+def ensure_workers():
+    """
+    Start the OCR worker processes once per server process, with its first request,
+    and a thread that replaces any that die. This covers `flask run`, WSGI servers
+    and the debug reloader (whose watcher process never serves requests) alike.
+    """
+    global workers_started
+    if workers_started:
+        return
+    with workers_lock:
+        if not workers_started and app.config['OCR_WORKERS'] > 0:
+            processes, stop_event = start_workers(app.config['OCR_WORKERS'])
+            threading.Thread(target=supervise_workers, args=(processes, stop_event),
+                             name='ocr-supervisor', daemon=True).start()
+        workers_started = True
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def upload_error(files):
+    """Validation message for an upload request, or None if it is acceptable."""
+    if 'file' not in files:
+        return 'No file uploaded'
+    if files['file'].filename == '':
+        return 'No file selected'
+    if not allowed_file(files['file'].filename):
+        return 'Invalid file type. Use PNG, JPG, JPEG, TIFF or PDF'
+    return None
+
+def persist_upload(data, filepath):
+    """Write an uploaded image to disk via a temp file; runs on persist_executor."""
+    try:
+        if os.path.exists(filepath):
+            return
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except OSError as e:
+        logger.error(f"Error saving upload {filepath}: {e}")
+
+def highlight(snippet):
+    """HTML for a search snippet: the text escaped, with matches in <mark> tags."""
+    return Markup(str(escape(snippet or '')).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+def search_page():
+    """Hits for the request's q and page arguments: (query, page, hits with HTML snippets, whether more follow)."""
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    hits, has_more = search_ocr_results(query, page=page, per_page=app.config['SEARCH_RESULTS_PER_PAGE'])
+    for hit in hits:
+        hit['snippet'] = highlight(hit['snippet'])
+    return query, page, hits, has_more
+
+def queue_upload(file):
+    """
+    Queue an uploaded file for OCR straight from memory.
+    The image bytes travel with the job, so OCR never waits for the original
+    to be written; that happens in the background when PERSIST_UPLOADS is set.
+    Returns:
+        int: Job ID
+    Raises:
+        QueueFullError: If too many jobs are waiting
+    """
+    data = file.read()
+    # Content-addressed names: identical uploads share a file and different ones never collide
+    filename = f"{content_hash(data)[:16]}_{secure_filename(file.filename) or 'upload'}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    job_id = enqueue_job(filepath, max_queued=app.config['MAX_QUEUED_JOBS'], image_data=data)
+    if app.config['PERSIST_UPLOADS']:
+        persist_executor.submit(persist_upload, data, filepath)
+    return job_id
+
+def queue_document(file):
+    """
+    Save an uploaded TIFF or PDF and queue each of its pages for OCR.
+    The file is written before queueing, since workers render pages from it, and
+    removed again if it cannot be read or queued (unless an earlier upload of the
+    same file already saved it).
+    Returns:
+        tuple: (document ID, page count)
+    Raises:
+        QueueFullError: If too many jobs are waiting
+    """
+    data = file.read()
+    filename = f"{content_hash(data)[:16]}_{secure_filename(file.filename) or 'upload'}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    saved_before = os.path.exists(filepath)
+    persist_upload(data, filepath)
+    try:
+        page_count = count_pages(filepath)
+        return enqueue_document(filepath, page_count, max_queued=app.config['MAX_QUEUED_JOBS']), page_count
+    except Exception:
+        if not saved_before and os.path.exists(filepath):
+            os.remove(filepath)
+        raise
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    """Render homepage with upload form and OCR results."""
-    results = get_all_ocr_results()
+    """Render homepage with upload form and one page of OCR results (?before=<cursor> for older ones)."""
     error = None
     success = None
     
     if request.method == 'POST':
-        if 'file' not in request.files:
-            error = 'No file uploaded'
-        else:
+        error = upload_error(request.files)
+        if not error:
             file = request.files['file']
-            if file.filename == '':
-                error = 'No file selected'
-            elif not allowed_file(file.filename):
-                error = 'Invalid file type. Use PNG, JPG, or JPEG'
-            else:
-                try:
-                    filename = file.filename
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(filepath)
-                    result = extract_text(filepath)
-                    store_ocr_result(result)
-                    success = f"Successfully processed {filename}"
-                    logger.info(f"Processed {filename}")
-                except Exception as e:
-                    error = f"Error processing file: {e}"
-                    logger.error(error)
-                return redirect(url_for('index'))
+            try:
+                if is_document(file.filename):
+                    document_id, page_count = queue_document(file)
+                    logger.info(f"Queued {file.filename} as document {document_id}")
+                    return redirect(url_for('index', document=document_id, pages=page_count))
+                job_id = queue_upload(file)
+                logger.info(f"Queued {file.filename} as job {job_id}")
+                return redirect(url_for('index', job=job_id))
+            except QueueFullError:
+                error = 'The OCR queue is full. Please try again shortly.'
+            except Exception as e:
+                error = f"Error processing file: {e}"
+                logger.error(error)
+    elif request.args.get('job'):
+        success = f"Queued as job {request.args['job']}. Its text will appear below when OCR finishes."
+    elif request.args.get('document'):
+        success = (f"Queued as document {request.args['document']} ({request.args.get('pages', '?')} pages). "
+                   "Its text will appear below when every page is done.")
+    else:
+        # Messages from the clear and download routes, which redirect here
+        error = request.args.get('error')
+        success = request.args.get('success')
     
-    return render_template('index.html', results=results, error=error, success=success)
+    results, next_cursor = list_ocr_results(before=request.args.get('before', type=int),
+                                            limit=app.config['RESULTS_PER_PAGE'])
+    return render_template('index.html', results=results, next_cursor=next_cursor,
+                           jobs=queue_counts(), error=error, success=success)
+
+@app.route('/results')
+def list_results():
+    """
+    One page of results as JSON, newest first: id, image_path, text_length, error and snippet.
+    Pass ?before=<next_cursor> for the following page.
+    """
+    results, next_cursor = list_ocr_results(before=request.args.get('before', type=int),
+                                            limit=min(request.args.get('limit', app.config['RESULTS_PER_PAGE'], type=int), 500))
+    return jsonify({'results': results, 'next_cursor': next_cursor})
+
+@app.route('/search')
+def search():
+    """Search OCR text; renders ranked hits with highlighted snippets, a page at a time (?q=...&page=N)."""
+    query, page, hits, has_more = search_page()
+    return render_template('index.html', query=query, hits=hits, page=page, has_more=has_more,
+                           results=[], jobs=queue_counts())
+
+@app.route('/results/search')
+def search_results():
+    """
+    Search OCR text as JSON: hits (id, image_path, error, rank and an HTML snippet with
+    matches in <mark> tags), best first, with has_more for ?page=N+1.
+    """
+    query, page, hits, has_more = search_page()
+    return jsonify({'query': query, 'page': page, 'hits': hits, 'has_more': has_more})
+
+@app.route('/results/<int:result_id>')
+def result_detail(result_id):
+    """Full text of one result, fetched when a homepage card is expanded."""
+    result = get_ocr_result(result_id)
+    if result is None:
+        return jsonify({'error': 'Unknown result'}), 404
+    return jsonify(result)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue an uploaded image for OCR and return its job ID without waiting for the result.
+    A TIFF or PDF is queued page by page instead, returning its document ID.
+    """
+    error = upload_error(request.files)
+    if error:
+        return jsonify({'error': error}), 400
+    file = request.files['file']
+    try:
+        if is_document(file.filename):
+            document_id, page_count = queue_document(file)
+            return jsonify({
+                'document_id': document_id,
+                'page_count': page_count,
+                'document_url': url_for('document_status', document_id=document_id),
+            }), 202
+        job_id = queue_upload(file)
+    except QueueFullError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except (OSError, RuntimeError) as e:
+        # Unreadable document, or no PDF library installed
+        return jsonify({'error': f"Cannot read document: {e}"}), 400
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'result_url': url_for('job_result', job_id=job_id),
+    }), 202
+
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    """Status of an OCR job: queued, running, done or failed."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/result')
+def job_result(job_id):
+    """OCR text for a finished job; 202 with the status while it is still pending."""
+    job = get_job(job_id, include_text=True)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] in ('queued', 'running'):
+        return jsonify({'id': job_id, 'status': job['status']}), 202
+    return jsonify({'id': job_id, 'status': job['status'], 'image_path': job['image_path'],
+                    'text': job['text'], 'error': job['error']})
+
+@app.route('/documents/<int:document_id>')
+def document_status(document_id):
+    """
+    Progress of a multi-page document and the pages finished so far.
+    Pass ?after=<cursor> from the previous response to get only pages finished
+    since, so a client can show text while the rest is still being OCR'd.
+    """
+    document = get_document(document_id, after=request.args.get('after', 0, type=int))
+    if document is None:
+        return jsonify({'error': 'Unknown document'}), 404
+    return jsonify(document)
 
 @app.route('/clear', methods=['POST'])
 def clear_database():
     """Clear all OCR results from the database."""
     try:
-        conn = sqlite3.connect('data/ocr_data.db')
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM ocr_results')
-        conn.commit()
-        conn.close()
-        logger.info("Database cleared")
+        clear_results()
         success = "Database cleared successfully"
     except sqlite3.Error as e:
         logger.error(f"Error clearing database: {e}")
         error = f"Error clearing database: {e}"
-        return redirect(url_for('index'), error=error)
-    return redirect(url_for('index'), success=success)
+        return redirect(url_for('index', error=error))
+    return redirect(url_for('index', success=success))
 
 @app.route('/download/<path:image_path>')
 def download_text(image_path):
-    """Download extracted text as a .txt file."""
+    """Download extracted text as a .txt file, streamed from the database in chunks."""
     try:
-        conn = sqlite3.connect('data/ocr_data.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT text FROM ocr_results WHERE image_path = ?', (image_path,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if result and result[0] != 'N/A':
-            text = result[0]
-            return send_file(
-                io.BytesIO(text.encode('utf-8')),
-                mimetype='text/plain',
-                as_attachment=True,
-                download_name=f"{os.path.basename(image_path)}_text.txt"
+        result_id = find_ocr_result(image_path)
+        if result_id is not None:
+            return Response(
+                stream_with_context(iter_ocr_text(result_id)),
+                mimetype='text/plain; charset=utf-8',
+                headers={'Content-Disposition': f'attachment; filename="{secure_filename(os.path.basename(image_path))}_text.txt"'}
             )
         error = "No text available for download"
-        return redirect(url_for('index'), error=error)
+        return redirect(url_for('index', error=error))
     except Exception as e:
         logger.error(f"Error downloading text: {e}")
         error = f"Error downloading text: {e}"
-        return redirect(url_for('index'), error=error)
+        return redirect(url_for('index', error=error))
+
+@app.route('/export')
+def export():
+    """
+    Stream OCR results as a file download without loading them all into memory.
+    Query parameters: format (jsonl, zip or parquet), since and until (date, ISO time or
+    timestamp, on the creation time), errors (only or exclude) and q (full-text search).
+    """
+    fmt = request.args.get('format', 'jsonl')
+    try:
+        chunks = export_results(fmt, since=parse_time(request.args.get('since')), until=parse_time(request.args.get('until')),
+                                errors=request.args.get('errors'), query=request.args.get('q'))
+    except (ValueError, RuntimeError) as e:
+        return jsonify({'error': str(e)}), 400
+    mimetype, extension = FORMATS[fmt]
+    # No Content-Length, so the response is sent chunked as rows are read
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="ocr_results.{extension}"'})
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,274 @@
+import os
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from ocr_processor import extract_text, current_backend
+from database import store_ocr_results, store_page_results, fail_documents
+from documents import DOCUMENT_EXTENSIONS, Page, ocr_page
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+# Multi-page TIFF and PDF files are split into pages (see documents.expand_documents)
+INPUT_EXTENSIONS = IMAGE_EXTENSIONS + DOCUMENT_EXTENSIONS
+
+# Extra seconds the parent waits past the Tesseract timeout before it gives up on a worker.
+# Tesseract itself is killed after timeout; this backstop catches hangs outside it.
+TIMEOUT_GRACE = 10
+# How often to check whether queued images have started running
+POLL_INTERVAL = 1.0
+
+def _init_worker():
+    """Load the OCR backend once when a pool process starts, not on its first image."""
+    try:
+        current_backend()
+    except Exception as e:
+        logger.error(f"Failed to load OCR backend: {e}")
+
+def _ocr_worker(item, timeout, pipeline):
+    """Run in a pool process: OCR one image or document page, killing Tesseract after timeout seconds."""
+    if isinstance(item, Page):
+        # Only this page is rasterized, and only here in the worker
+        return ocr_page(item, timeout=timeout, pipeline=pipeline)
+    return extract_text(item, timeout=timeout, pipeline=pipeline)
+
+def _failed(item, error, transient=False):
+    """Result for an image that produced no text; transient failures (timeouts, crashes) may succeed on a retry."""
+    result = {'image_path': str(item), 'text': 'N/A', 'error': error, 'timings': {}, 'transient': transient}
+    if isinstance(item, Page):
+        result.update(document_id=item.document_id, page_number=item.number)
+    return result
+
+class BatchStats:
+    """Counts and per-stage time totals for a batch run."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.images = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.cache_hits = 0
+        self.stages = {'read': 0.0, 'hash': 0.0, 'preprocess': 0.0, 'ocr': 0.0, 'store': 0.0}
+
+    def add(self, result):
+        self.images += 1
+        if result['error']:
+            self.errors += 1
+        if result.get('cached'):
+            self.cache_hits += 1
+        for stage, seconds in result.get('timings', {}).items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def images_per_sec(self):
+        elapsed = time.perf_counter() - self.start
+        return self.images / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        """
+        Returns:
+            dict: images, errors, timeouts, crashes, cache hits, elapsed seconds, images/sec and
+                  mean seconds per image for each stage (summed across workers)
+        """
+        elapsed = time.perf_counter() - self.start
+        per_image = {stage: total / self.images if self.images else 0.0 for stage, total in self.stages.items()}
+        return {
+            'images': self.images,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+            'cache_hits': self.cache_hits,
+            'elapsed': elapsed,
+            'images_per_sec': self.images / elapsed if elapsed > 0 else 0.0,
+            'stage_seconds_per_image': per_image,
+        }
+
+def iter_image_paths(image_dir, extensions=IMAGE_EXTENSIONS):
+    """Yield image paths in a directory without listing it all up front."""
+    with os.scandir(image_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(extensions):
+                yield entry.path
+
+def _shutdown(executor):
+    """Stop a pool without waiting, terminating workers that are stuck or dead."""
+    # ProcessPoolExecutor has no public way to kill a busy worker
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+def ocr_images(image_paths, workers=None, max_in_flight=None, timeout=120, batch_size=50,
+               db_name='data/ocr_data.db', progress_every=100, pipeline=None, on_result=None,
+               on_flush=None):
+    """
+    OCR images across a process pool and store the results in batches.
+    At most max_in_flight images are queued at once, so image_paths may be a
+    lazy iterator over any number of files. Pages of multi-page documents
+    (from documents.expand_documents) are OCR'd in parallel like images and
+    stored in the pages table. An image that takes longer than
+    timeout, or whose worker dies, is stored with an error instead of
+    stopping the run: when a worker crashes, the images it may have been
+    running are retried one at a time to find the one that caused it.
+    Documents whose pages are not all stored when the run ends (it was
+    interrupted, or a store failed) are marked failed.
+    Args:
+        image_paths (iterable): Image file paths and/or document Pages
+        workers (int): Worker processes (defaults to the CPU count)
+        max_in_flight (int): Images submitted but not yet finished (defaults to 2 x workers)
+        timeout (float): Seconds allowed per image (0 or None for no limit)
+        batch_size (int): Results per database transaction
+        db_name (str): Path to the SQLite database
+        progress_every (int): Log throughput every this many images
+        pipeline (Pipeline): Preprocessing stages (defaults to grayscale + Otsu threshold)
+        on_result (callable): Called with each result as it finishes, in completion order
+        on_flush (callable): Called with each batch of results once it is stored in the database
+            (results whose transaction failed are left out)
+    Returns:
+        dict: Run summary from BatchStats.summary
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or workers * 2, 1)
+    paths = iter(image_paths)
+    requeued = deque()
+    retries = deque()
+    pending = {}
+    buffer = []
+    # Documents with pages handed to this run
+    documents = set()
+    stats = BatchStats()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    # Tesseract treats 0 as no limit; the parent's deadline must too
+    timeout = timeout or 0
+    limit = f"{timeout}s timeout" if timeout else "no timeout"
+    logger.info(f"Starting batch OCR with {workers} workers, {max_in_flight} images in flight, {limit}")
+
+    def record(result):
+        buffer.append(result)
+        stats.add(result)
+        if on_result:
+            on_result(result)
+        if len(buffer) >= batch_size:
+            flush()
+        if stats.images % progress_every == 0:
+            logger.info(f"Processed {stats.images} images ({stats.images_per_sec():.2f} images/sec)")
+
+    def flush():
+        start = time.perf_counter()
+        images = [result for result in buffer if 'document_id' not in result]
+        pages = [result for result in buffer if 'document_id' in result]
+        stored = []
+        # The store functions log a failed transaction and return 0
+        if store_ocr_results(images, db_name) == len(images):
+            stored.extend(images)
+        if store_page_results(pages, db_name) == len(pages):
+            stored.extend(pages)
+        stats.stages['store'] += time.perf_counter() - start
+        if on_flush and stored:
+            on_flush(stored)
+        buffer.clear()
+
+    def submit(image_path, retry):
+        if isinstance(image_path, Page):
+            documents.add(image_path.document_id)
+        try:
+            future = executor.submit(_ocr_worker, image_path, timeout, pipeline)
+        except BrokenProcessPool:
+            # A worker died and its future hasn't been collected yet; put the image back
+            (retries if retry else requeued).appendleft(image_path)
+            return False
+        # The deadline is set once a worker picks the image up, not while it waits in the queue
+        pending[future] = [image_path, None, retry]
+        return True
+
+    def restart_pool():
+        nonlocal executor
+        _shutdown(executor)
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    try:
+        while True:
+            broken = False
+            # Crash suspects run alone so a second crash identifies the culprit
+            if retries:
+                if not pending:
+                    broken = not submit(retries.popleft(), True)
+            elif not any(retry for _, _, retry in pending.values()):
+                while len(pending) < max_in_flight:
+                    image_path = requeued.popleft() if requeued else next(paths, None)
+                    if image_path is None:
+                        break
+                    if not submit(image_path, False):
+                        broken = True
+                        break
+            if broken and not pending:
+                # The pool broke with nothing in flight whose failure would restart it
+                # below (e.g. a worker was killed while idle); replace it and carry on
+                logger.warning("Worker pool broke while idle; restarting it")
+                restart_pool()
+                continue
+            if not pending:
+                break
+
+            now = time.monotonic()
+            for future, entry in pending.items():
+                # running() turns true when the image enters the pool's call queue, which
+                # holds one image more than there are workers, so allow for one wait
+                if timeout and entry[1] is None and future.running():
+                    entry[1] = now + 2 * timeout + TIMEOUT_GRACE
+            deadlines = [deadline for _, deadline, _ in pending.values() if deadline is not None]
+            wait_for = min(min(deadlines, default=now + POLL_INTERVAL) - now, POLL_INTERVAL)
+            done, _ = wait(pending, timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+
+            crashed = []
+            for future in done:
+                image_path, _, retry = pending.pop(future)
+                try:
+                    record(future.result())
+                except BrokenProcessPool:
+                    crashed.append((image_path, retry))
+                except Exception as e:
+                    record(_failed(image_path, f"Worker error: {e}"))
+
+            now = time.monotonic()
+            expired = [future for future, (_, deadline, _) in pending.items() if deadline is not None and deadline <= now]
+            if not crashed and not expired:
+                continue
+
+            # A hung or dead worker can't be reclaimed on its own: restart the pool
+            for future in expired:
+                image_path, _, _ = pending.pop(future)
+                stats.timeouts += 1
+                logger.warning(f"Timed out after {timeout}s: {image_path}")
+                record(_failed(image_path, f"OCR timed out after {timeout}s", transient=True))
+            if crashed:
+                # Every image still in flight is a suspect; the pool is broken for all of them
+                crashed.extend((image_path, retry) for image_path, _, retry in pending.values())
+                stats.crashes += 1
+                for image_path, retry in crashed:
+                    if retry or len(crashed) == 1:
+                        logger.error(f"Worker crashed on {image_path}")
+                        record(_failed(image_path, 'OCR worker crashed', transient=True))
+                    else:
+                        retries.append(image_path)
+            else:
+                # Images cut short by the restart did nothing wrong; run them again first
+                requeued.extend(image_path for image_path, _, _ in pending.values())
+            pending.clear()
+            restart_pool()
+    finally:
+        flush()
+        _shutdown(executor)
+        fail_documents(documents, db_name)
+
+    summary = stats.summary()
+    stages = ', '.join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in summary['stage_seconds_per_image'].items())
+    logger.info(f"Batch OCR finished: {summary['images']} images in {summary['elapsed']:.1f}s "
+                f"({summary['images_per_sec']:.2f} images/sec), {summary['cache_hits']} cached, {summary['errors']} errors, "
+                f"{summary['timeouts']} timeouts, {summary['crashes']} pool restarts; per image: {stages}")
+    return summary
@@ -0,0 +1,96 @@
+import argparse
+import glob
+import statistics
+import time
+import cv2
+import numpy as np
+from ocr_processor import BACKENDS, get_backend, preprocess_image
+
+RECEIPT_LINES = ['CORNER STORE', '123 MAIN ST', 'MILK 2L        3.49', 'BREAD          2.99',
+                 'EGGS 12       4.19', 'COFFEE        11.50', 'TOTAL         22.17', 'THANK YOU']
+
+def synthetic_receipts(count, seed=0):
+    """Small receipt-like images (a few short lines of text), where process startup dominates OCR time."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        lines = rng.choice(RECEIPT_LINES, size=4, replace=False)
+        image = np.full((40 + 30 * len(lines), 360), 255, np.uint8)
+        for row, line in enumerate(lines):
+            cv2.putText(image, str(line), (10, 40 + 30 * row), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 0, 2)
+        images.append(image)
+    return images
+
+def load_images(pattern):
+    """Preprocess images matching a glob so only OCR is timed."""
+    images = []
+    for path in sorted(glob.glob(pattern)):
+        image = preprocess_image(path)
+        if image is not None:
+            images.append(image)
+    return images
+
+def bench_backend(name, images, repeat):
+    """Time engine start-up, the first image, then every image over repeat passes."""
+    start = time.perf_counter()
+    backend = get_backend(name)
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend.image_to_text(images[0])
+    first = time.perf_counter() - start
+
+    latencies = []
+    texts = []
+    for _ in range(repeat):
+        texts = []
+        for image in images:
+            start = time.perf_counter()
+            texts.append(backend.image_to_text(image).strip())
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        'startup_ms': startup * 1000,
+        'first_ms': first * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'images_per_sec': len(latencies) / sum(latencies),
+        'texts': texts,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-image latency of OCR backends.')
+    parser.add_argument('--images', help='Glob of images to OCR (default: synthetic receipts)')
+    parser.add_argument('--synthetic', type=int, default=50, help='Synthetic receipts when --images is not given')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the image set')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='Comma-separated backends to compare')
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_receipts(args.synthetic)
+    if not images:
+        print(f"No images match '{args.images}'.")
+        return
+
+    print(f"{len(images)} images, {args.repeat} passes")
+    baseline = None
+    for name in args.backends.split(','):
+        try:
+            stats = bench_backend(name, images, args.repeat)
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        print(f"\n[{name}] start-up {stats['startup_ms']:.1f} ms, first image {stats['first_ms']:.1f} ms")
+        print(f"    per image: mean {stats['mean_ms']:.1f} ms, p50 {stats['p50_ms']:.1f} ms, "
+              f"p95 {stats['p95_ms']:.1f} ms ({stats['images_per_sec']:.1f} images/sec)")
+
+        # Backends run the same engine and settings, so the text should match
+        if baseline is None:
+            baseline = (name, stats['texts'])
+        else:
+            differing = sum(a != b for a, b in zip(stats['texts'], baseline[1]))
+            if differing:
+                print(f"    WARNING: {differing} of {len(images)} texts differ from {baseline[0]}")
+
+if __name__ == '__main__':
+    main()
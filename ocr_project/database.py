@@ -1,60 +1,579 @@
+import os
+import re
+import time
 import sqlite3
 import logging
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def init_db(db_name='data/ocr_data.db'):
-    """Initialize SQLite database with an ocr_results table."""
-    try:
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ocr_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                image_path TEXT,
-                text TEXT,
-                error TEXT
-            )
-        ''')
-        conn.commit()
-        logger.info("Database initialized")
-        return conn
+DB_NAME = 'data/ocr_data.db'
+
+def _add_columns(table, columns):
+    """Migration step adding columns a table is missing (for tables created before migrations tracked them)."""
+    def step(conn):
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, definition in columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+# Schema changes in order; PRAGMA user_version records how many have been applied.
+# A step is an SQL statement or a function called with the connection.
+MIGRATIONS = [
+    # 1: results, and multi-page documents with their pages
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS ocr_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_path TEXT,
+            text TEXT,
+            error TEXT
+        )
+        ''',
+        # A multi-page TIFF or PDF; result_id points at its combined text in ocr_results once every page is done
+        '''
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            page_count INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            result_id INTEGER,
+            created REAL NOT NULL,
+            finished REAL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_id INTEGER NOT NULL REFERENCES documents (id),
+            page_number INTEGER NOT NULL,
+            text TEXT,
+            error TEXT,
+            UNIQUE (document_id, page_number)
+        )
+        ''',
+    ],
+    # 2: creation time, and indexes for lookups by path (downloads) and by time.
+    # Rows stored before this migration have no creation time.
+    [
+        'ALTER TABLE ocr_results ADD COLUMN created REAL',
+        'CREATE INDEX IF NOT EXISTS idx_ocr_results_image_path ON ocr_results (image_path)',
+        'CREATE INDEX IF NOT EXISTS idx_ocr_results_created ON ocr_results (created)',
+    ],
+    # 3: full-text index over OCR text. External content: the text is stored once, in
+    # ocr_results, and triggers keep the index in step with every insert, update and delete.
+    # Prefix indexes make short word* searches several times faster.
+    [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS ocr_results_fts USING fts5(
+            text, content='ocr_results', content_rowid='id', tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ocr_results_fts_insert AFTER INSERT ON ocr_results BEGIN
+            INSERT INTO ocr_results_fts (rowid, text) VALUES (new.id, new.text);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ocr_results_fts_delete AFTER DELETE ON ocr_results BEGIN
+            INSERT INTO ocr_results_fts (ocr_results_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ocr_results_fts_update AFTER UPDATE OF text ON ocr_results BEGIN
+            INSERT INTO ocr_results_fts (ocr_results_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO ocr_results_fts (rowid, text) VALUES (new.id, new.text);
+        END
+        ''',
+        # Index the rows stored before this migration
+        "INSERT INTO ocr_results_fts (ocr_results_fts) VALUES ('rebuild')",
+    ],
+    # 4: files already OCR'd by incremental ingestion (see ingest.py)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            path TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash TEXT,
+            ingested REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+    ],
+    # 5: the upload job queue (see job_queue.py). Databases used by the queue before it
+    # was a migration already have the table, possibly without the later columns.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS ocr_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_path TEXT NOT NULL,
+            image_data BLOB,
+            document_id INTEGER,
+            page_number INTEGER,
+            status TEXT NOT NULL DEFAULT 'queued',
+            result_id INTEGER,
+            error TEXT,
+            worker TEXT,
+            created REAL NOT NULL,
+            started REAL,
+            heartbeat REAL,
+            finished REAL
+        )
+        ''',
+        _add_columns('ocr_jobs', [('image_data', 'BLOB'), ('document_id', 'INTEGER'), ('page_number', 'INTEGER'),
+                                  ('heartbeat', 'REAL')]),
+        'CREATE INDEX IF NOT EXISTS idx_ocr_jobs_status ON ocr_jobs (status, id)',
+    ],
+    # 6: OCR results by image content and config (see ocr_cache.py)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            content_hash TEXT NOT NULL,
+            config_key TEXT NOT NULL,
+            text TEXT,
+            created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (content_hash, config_key)
+        ) WITHOUT ROWID
+        ''',
+    ],
+    # 7: how many times each job was claimed, so jobs that keep killing workers are failed
+    [
+        'ALTER TABLE ocr_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0',
+    ],
+]
+
+# Search snippets mark matches with these characters, which never occur in OCR text,
+# so callers can escape the snippet and then swap in their own highlighting
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+_local = threading.local()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+def migrate(conn):
+    """
+    Apply any MIGRATIONS the database doesn't have yet, each in its own transaction.
+    Safe to run from several processes at once: the version is re-read under the write lock.
+    Returns:
+        int: Schema version
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    while version < len(MIGRATIONS):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < len(MIGRATIONS):
+                for step in MIGRATIONS[version]:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                version += 1
+                # PRAGMA doesn't accept parameters; version is always an int
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        logger.info(f"Database migrated to version {version}")
+    return version
+
+def get_connection(db_name=DB_NAME):
+    """
+    This thread's connection to db_name, opened on first use (and again in a forked child).
+    Connections are shared by every function on the thread, so callers must not
+    close them. The schema is migrated the first time a process opens a database.
+    Args:
+        db_name (str): Path to the SQLite database
+    Returns:
+        sqlite3.Connection: Connection in WAL mode
+    """
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.connections = {}
+        _local.pid = os.getpid()
+    conn = _local.connections.get(db_name)
+    if conn is None:
+        # The web app, queue workers and batch jobs share the database, so wait for locks rather than fail
+        conn = sqlite3.connect(db_name, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # In WAL mode this only risks the last transactions on power loss, never corruption
+        conn.execute('PRAGMA synchronous=NORMAL')
+        with _migrate_lock:
+            if (os.getpid(), db_name) not in _migrated:
+                migrate(conn)
+                _migrated.add((os.getpid(), db_name))
+        _local.connections[db_name] = conn
+    return conn
+
+def init_db(db_name=DB_NAME):
+    """Create or migrate the database schema. Returns this thread's shared connection (don't close it), or None on error."""
+    try:
+        return get_connection(db_name)
     except sqlite3.Error as e:
         logger.error(f"Database error: {e}")
         return None
 
-def store_ocr_result(result, db_name='data/ocr_data.db'):
+def insert_ocr_result(conn, result):
+    """Add one result on an open connection (the caller commits). Returns its row ID."""
+    return conn.execute('''
+        INSERT INTO ocr_results (image_path, text, error, created)
+        VALUES (?, ?, ?, ?)
+    ''', (result['image_path'], result['text'], result['error'], time.time())).lastrowid
+
+def store_ocr_result(result, db_name=DB_NAME):
     """Store OCR result in SQLite database."""
     conn = init_db(db_name)
     if not conn:
         return
     
     try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO ocr_results (image_path, text, error)
-            VALUES (?, ?, ?)
-        ''', (result['image_path'], result['text'], result['error']))
-        conn.commit()
+        with conn:
+            insert_ocr_result(conn, result)
         logger.info(f"Stored OCR result for {result['image_path']}")
     except sqlite3.Error as e:
         logger.error(f"Error storing OCR result: {e}")
-    finally:
-        conn.close()
 
-def get_all_ocr_results(db_name='data/ocr_data.db'):
+def store_ocr_results(results, db_name=DB_NAME):
+    """
+    Store a batch of OCR results in one transaction.
+    Args:
+        results (list): Result dicts as returned by extract_text
+        db_name (str): Path to the SQLite database
+    Returns:
+        int: Number of rows stored
+    """
+    if not results:
+        return 0
+    conn = init_db(db_name)
+    if not conn:
+        return 0
+    
+    try:
+        now = time.time()
+        with conn:
+            conn.executemany('''
+                INSERT INTO ocr_results (image_path, text, error, created)
+                VALUES (?, ?, ?, ?)
+            ''', [(result['image_path'], result['text'], result['error'], now) for result in results])
+        logger.info(f"Stored {len(results)} OCR results")
+        return len(results)
+    except sqlite3.Error as e:
+        logger.error(f"Error storing OCR results: {e}")
+        return 0
+
+def get_all_ocr_results(db_name=DB_NAME):
     """Retrieve all OCR results from the database."""
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
     try:
-        cursor.execute('SELECT image_path, text, error FROM ocr_results')
+        cursor = get_connection(db_name).execute('SELECT image_path, text, error FROM ocr_results')
         results = [{'image_path': row[0], 'text': row[1], 'error': row[2]} for row in cursor.fetchall()]
         logger.info(f"Retrieved {len(results)} OCR results")
         return results
     except sqlite3.Error as e:
         logger.error(f"Error retrieving OCR results: {e}")
         return []
-    finally:
-        conn.close()
\ No newline at end of file
+
+def list_ocr_results(before=None, limit=50, snippet_chars=200, db_name=DB_NAME):
+    """
+    One page of results, newest first, without loading full texts.
+    Keyset pagination: pass the previous page's next cursor as before, so each
+    page is an index range scan on id however deep it is, unlike OFFSET.
+    Args:
+        before (int): Only results with a lower ID (None for the newest)
+        limit (int): Results per page
+        snippet_chars (int): Characters of text returned per result
+        db_name (str): Path to the SQLite database
+    Returns:
+        tuple: (list of dicts with id, image_path, text_length, error and snippet,
+                cursor for the next page or None on the last page)
+    """
+    try:
+        rows = get_connection(db_name).execute('''
+            SELECT id, image_path, length(text), error, substr(text, 1, ?)
+            FROM ocr_results
+            WHERE id < ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (snippet_chars, before if before is not None else 2 ** 63 - 1, limit + 1)).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error listing OCR results: {e}")
+        return [], None
+    # One row more than asked for tells whether another page follows
+    results = [{'id': row[0], 'image_path': row[1], 'text_length': row[2] or 0, 'error': row[3], 'snippet': row[4] or ''}
+               for row in rows[:limit]]
+    cursor = results[-1]['id'] if len(rows) > limit else None
+    return results, cursor
+
+def get_ocr_result(result_id, db_name=DB_NAME):
+    """
+    A single result with its full text.
+    Returns:
+        dict: id, image_path, text, error and created, or None if unknown
+    """
+    row = get_connection(db_name).execute('SELECT id, image_path, text, error, created FROM ocr_results WHERE id = ?',
+                                          (result_id,)).fetchone()
+    return dict(zip(('id', 'image_path', 'text', 'error', 'created'), row)) if row else None
+
+def fts_query(query):
+    """
+    Turn a user's search into an FTS5 query that can't be a syntax error.
+    Words and "quoted phrases" must all match; a trailing * matches a prefix.
+    Args:
+        query (str): Search as typed
+    Returns:
+        str: FTS5 MATCH expression, or '' if there is nothing to search for
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        term = (phrase or word).replace('"', '')
+        prefix = bool(word) and term.endswith('*')
+        term = term.rstrip('*').strip()
+        if term:
+            terms.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+def search_ocr_results(query, page=1, per_page=20, snippet_tokens=24, db_name=DB_NAME):
+    """
+    Full-text search over OCR text, best matches first (BM25).
+    Args:
+        query (str): Search as typed (see fts_query)
+        page (int): Page of hits, from 1
+        per_page (int): Hits per page
+        snippet_tokens (int): Words of context in each snippet
+        db_name (str): Path to the SQLite database
+    Returns:
+        tuple: (list of dicts with id, image_path, error, snippet and rank, whether more pages follow).
+               Matches in snippets are wrapped in HIGHLIGHT_START and HIGHLIGHT_END.
+    """
+    match = fts_query(query)
+    if not match:
+        return [], False
+    try:
+        rows = get_connection(db_name).execute('''
+            SELECT r.id, r.image_path, r.error, snippet(ocr_results_fts, 0, ?, ?, '…', ?), ocr_results_fts.rank
+            FROM ocr_results_fts JOIN ocr_results r ON r.id = ocr_results_fts.rowid
+            WHERE ocr_results_fts MATCH ?
+            ORDER BY ocr_results_fts.rank
+            LIMIT ? OFFSET ?
+        ''', (HIGHLIGHT_START, HIGHLIGHT_END, snippet_tokens, match, per_page + 1, (page - 1) * per_page)).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Search for {query!r} failed: {e}")
+        return [], False
+    hits = [{'id': row[0], 'image_path': row[1], 'error': row[2], 'snippet': row[3], 'rank': row[4]} for row in rows[:per_page]]
+    return hits, len(rows) > per_page
+
+def rebuild_search_index(db_name=DB_NAME):
+    """Re-index all OCR text from scratch, e.g. after rows were changed with the triggers missing."""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute("INSERT INTO ocr_results_fts (ocr_results_fts) VALUES ('rebuild')")
+    logger.info("Search index rebuilt")
+
+def optimize_search_index(db_name=DB_NAME):
+    """Merge the index's segments into one, which keeps queries fast after many small inserts."""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute("INSERT INTO ocr_results_fts (ocr_results_fts) VALUES ('optimize')")
+    logger.info("Search index optimized")
+
+def find_ocr_result(image_path, db_name=DB_NAME):
+    """
+    ID of the most recent successful result for an image (uses the image_path index).
+    Returns:
+        int: Result ID, or None if there is no result or it failed
+    """
+    row = get_connection(db_name).execute(
+        "SELECT id FROM ocr_results WHERE image_path = ? AND text != 'N/A' ORDER BY id DESC LIMIT 1",
+        (image_path,)).fetchone()
+    return row[0] if row else None
+
+def iter_ocr_text(result_id, chunk_size=64 * 1024, db_name=DB_NAME):
+    """
+    Yield a result's text as UTF-8 in chunks, read incrementally from the database
+    so a long text is never held in memory whole.
+    Args:
+        result_id (int): Result ID
+        chunk_size (int): Bytes per chunk
+        db_name (str): Path to the SQLite database
+    Yields:
+        bytes: Consecutive pieces of the text
+    """
+    with get_connection(db_name).blobopen('ocr_results', 'text', result_id, readonly=True) as blob:
+        while True:
+            chunk = blob.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def clear_results(db_name=DB_NAME):
+    """Delete all OCR results, documents and pages in one transaction."""
+    conn = get_connection(db_name)
+    with conn:
+        # The delete trigger takes each row out of the search index too
+        conn.execute('DELETE FROM ocr_results')
+        conn.execute('DELETE FROM pages')
+        conn.execute('DELETE FROM documents')
+    logger.info("Database cleared")
+
+def insert_document(conn, path, page_count):
+    """Add a documents row on an open connection (the caller commits). Returns its ID."""
+    return conn.execute('INSERT INTO documents (path, page_count, created) VALUES (?, ?, ?)',
+                        (path, page_count, time.time())).lastrowid
+
+def fail_documents(document_ids, db_name=DB_NAME):
+    """
+    Mark documents that are still running as failed, for a run that stops
+    before all their pages are stored. Finished documents are left alone.
+    Returns:
+        int: Number of documents marked failed
+    """
+    document_ids = list(document_ids)
+    if not document_ids:
+        return 0
+    conn = get_connection(db_name)
+    try:
+        with conn:
+            count = conn.execute(f"UPDATE documents SET status = 'failed', finished = ? WHERE status = 'running' "
+                                 f"AND id IN ({', '.join('?' * len(document_ids))})",
+                                 [time.time()] + document_ids).rowcount
+    except sqlite3.Error as e:
+        logger.error(f"Error marking documents failed: {e}")
+        return 0
+    if count:
+        logger.warning(f"Marked {count} unfinished documents failed")
+    return count
+
+def create_document(path, page_count, db_name=DB_NAME):
+    """
+    Record a multi-page document whose pages will be OCR'd separately.
+    Args:
+        path (str): Path to the TIFF or PDF
+        page_count (int): Number of pages
+        db_name (str): Path to the SQLite database
+    Returns:
+        int: Document ID, or None on error
+    """
+    conn = init_db(db_name)
+    if not conn:
+        return None
+    
+    try:
+        with conn:
+            return insert_document(conn, path, page_count)
+    except sqlite3.Error as e:
+        logger.error(f"Error creating document for {path}: {e}")
+        return None
+
+def insert_page_results(conn, results):
+    """
+    Add page results on an open connection (the caller commits) and finish any
+    document whose last page this was: its pages are joined into one ocr_results
+    row, so a document shows up like any other result. Pages of documents that
+    were deleted while they were being OCR'd (e.g. by clear_results) are dropped.
+    Args:
+        conn (sqlite3.Connection): Open connection
+        results (list): extract_text result dicts with document_id and page_number
+    """
+    document_ids = sorted({result['document_id'] for result in results})
+    existing = {row[0] for row in conn.execute(
+        f"SELECT id FROM documents WHERE id IN ({', '.join('?' * len(document_ids))})", document_ids)}
+    if len(existing) < len(document_ids):
+        logger.info(f"Dropping pages of deleted documents {sorted(set(document_ids) - existing)}")
+        results = [result for result in results if result['document_id'] in existing]
+    conn.executemany('''
+        INSERT OR REPLACE INTO pages (document_id, page_number, text, error)
+        VALUES (?, ?, ?, ?)
+    ''', [(result['document_id'], result['page_number'], result['text'], result['error']) for result in results])
+    for document_id in sorted(existing):
+        document = conn.execute("SELECT path, page_count FROM documents WHERE id = ? AND status = 'running'",
+                                (document_id,)).fetchone()
+        if document is None:
+            continue
+        path, page_count = document
+        pages = conn.execute('SELECT text, error FROM pages WHERE document_id = ? ORDER BY page_number',
+                             (document_id,)).fetchall()
+        if len(pages) < page_count:
+            continue
+        failed = sum(error is not None for _, error in pages)
+        text = '\n\n'.join(text for text, error in pages if error is None) if failed < page_count else 'N/A'
+        error = f"{failed} of {page_count} pages failed" if failed else None
+        result_id = insert_ocr_result(conn, {'image_path': path, 'text': text, 'error': error})
+        conn.execute("UPDATE documents SET status = 'done', result_id = ?, finished = ? WHERE id = ?",
+                     (result_id, time.time(), document_id))
+        logger.info(f"Document {document_id} finished ({page_count} pages, {failed} failed)")
+
+def store_page_results(results, db_name=DB_NAME):
+    """
+    Store a batch of document page results in one transaction.
+    Args:
+        results (list): Result dicts from documents.ocr_page
+        db_name (str): Path to the SQLite database
+    Returns:
+        int: Number of pages stored, including any dropped because their document
+             was deleted; 0 on error
+    """
+    if not results:
+        return 0
+    conn = init_db(db_name)
+    if not conn:
+        return 0
+    
+    try:
+        with conn:
+            insert_page_results(conn, results)
+        logger.info(f"Stored {len(results)} page results")
+        return len(results)
+    except sqlite3.Error as e:
+        logger.error(f"Error storing page results: {e}")
+        return 0
+
+def get_document(document_id, after=0, db_name=DB_NAME):
+    """
+    A document's progress and the pages finished so far.
+    Pages finish out of order, so they are returned in the order they were
+    stored; polling with after set to the previous response's cursor streams a
+    document's text page by page while the rest is still being OCR'd.
+    Args:
+        document_id (int): Document ID
+        after (int): Cursor from a previous call; only pages stored since then are returned
+        db_name (str): Path to the SQLite database
+    Returns:
+        dict: id, path, status, page_count, pages_done, timestamps, pages
+              (page_number, text, error) and cursor, or None if unknown
+    """
+    conn = get_connection(db_name)
+    try:
+        row = conn.execute('SELECT id, path, status, page_count, created, finished FROM documents WHERE id = ?',
+                           (document_id,)).fetchone()
+        if row is None:
+            return None
+        document = dict(zip(('id', 'path', 'status', 'page_count', 'created', 'finished'), row))
+        document['pages_done'] = conn.execute('SELECT COUNT(*) FROM pages WHERE document_id = ?',
+                                              (document_id,)).fetchone()[0]
+        rows = conn.execute('SELECT id, page_number, text, error FROM pages WHERE document_id = ? AND id > ? ORDER BY id',
+                            (document_id, after)).fetchall()
+        document['pages'] = [{'page_number': number, 'text': text, 'error': error} for _, number, text, error in rows]
+        document['cursor'] = rows[-1][0] if rows else after
+        return document
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving document {document_id}: {e}")
+        return None
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Maintain the OCR database.')
+    parser.add_argument('command', choices=['migrate', 'rebuild-search', 'optimize-search'],
+                        help='migrate: apply schema migrations (this also builds the search index the first time); '
+                             'rebuild-search: re-index all OCR text; optimize-search: merge index segments')
+    parser.add_argument('--db', default=DB_NAME, help='SQLite database path')
+    args = parser.parse_args()
+    # Opening the database applies any pending migrations
+    print(f"Schema version {get_connection(args.db).execute('PRAGMA user_version').fetchone()[0]}")
+    if args.command == 'rebuild-search':
+        rebuild_search_index(args.db)
+    elif args.command == 'optimize-search':
+        optimize_search_index(args.db)
@@ -0,0 +1,145 @@
+import os
+import logging
+import argparse
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+from ocr_processor import extract_text
+from database import create_document
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # PDF support is optional; either PyMuPDF or pdf2image works
+    fitz = None
+
+try:
+    import pdf2image
+except ImportError:
+    pdf2image = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTENSIONS = ('.tif', '.tiff', '.pdf')
+# Resolution PDF pages are rendered at; TIFF pages keep their scanned resolution
+RENDER_DPI = 300
+
+class Page(namedtuple('Page', ['document_id', 'path', 'number'])):
+    """One page (numbered from 1) of a document row, OCR'd on its own."""
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.path}#page={self.number}"
+
+def is_document(path):
+    """Whether a file is a multi-page document (TIFF or PDF) rather than a single image."""
+    return path.lower().endswith(DOCUMENT_EXTENSIONS)
+
+def _require_pdf_support():
+    if fitz is None and pdf2image is None:
+        raise RuntimeError('PDF support needs PyMuPDF (pip install pymupdf) or pdf2image')
+
+def count_pages(path):
+    """
+    Number of pages in a TIFF or PDF, read from its header without decoding any page.
+    Args:
+        path (str): Path to the document
+    Returns:
+        int: Page count
+    """
+    if path.lower().endswith('.pdf'):
+        _require_pdf_support()
+        if fitz is not None:
+            with fitz.open(path) as doc:
+                return doc.page_count
+        return pdf2image.pdfinfo_from_path(path)['Pages']
+    with Image.open(path) as img:
+        return getattr(img, 'n_frames', 1)
+
+def render_page(path, number, dpi=RENDER_DPI):
+    """
+    Rasterize a single page of a TIFF or PDF; the other pages are never decoded.
+    Args:
+        path (str): Path to the document
+        number (int): Page number, from 1
+        dpi (int): Resolution for PDF pages
+    Returns:
+        np.ndarray: Grayscale page image
+    """
+    if path.lower().endswith('.pdf'):
+        _require_pdf_support()
+        if fitz is not None:
+            with fitz.open(path) as doc:
+                pixmap = doc.load_page(number - 1).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                return np.frombuffer(pixmap.samples, np.uint8).reshape(pixmap.height, pixmap.width).copy()
+        img = pdf2image.convert_from_path(path, dpi=dpi, first_page=number, last_page=number, grayscale=True)[0]
+        return np.asarray(img.convert('L'))
+    with Image.open(path) as img:
+        img.seek(number - 1)
+        # Bilevel fax scans ('1') and colour pages alike become 8-bit grayscale
+        return np.asarray(img.convert('L'))
+
+def ocr_page(page, timeout=0, pipeline=None):
+    """
+    Render and OCR one page of a document.
+    Args:
+        page (Page): Page to OCR
+        timeout (float): Seconds before Tesseract is killed (0 for no limit)
+        pipeline (Pipeline): Preprocessing stages (defaults to grayscale + Otsu threshold)
+    Returns:
+        dict: extract_text result with document_id and page_number added
+    """
+    try:
+        image = render_page(page.path, page.number)
+    except Exception as e:
+        logger.error(f"Failed to render {page}: {e}")
+        result = {'image_path': str(page), 'text': 'N/A', 'error': f"Page rendering failed: {e}", 'timings': {}}
+    else:
+        result = extract_text(image, timeout=timeout, image_path=str(page), pipeline=pipeline)
+    result.update(document_id=page.document_id, page_number=page.number)
+    return result
+
+def expand_documents(paths, db_name='data/ocr_data.db'):
+    """
+    Yield image paths unchanged and each document as its pages.
+    A document row is created when the document is reached, and its pages are
+    yielded one at a time, so a batch engine can spread them over its workers
+    without anything being rasterized here.
+    Args:
+        paths (iterable): Image and document paths
+        db_name (str): Path to the SQLite database
+    Yields:
+        str or Page: Image path, or a page of a document
+    """
+    for path in paths:
+        if not is_document(path):
+            yield path
+            continue
+        try:
+            page_count = count_pages(path)
+        except Exception as e:
+            logger.error(f"Skipping unreadable document {path}: {e}")
+            continue
+        document_id = create_document(path, page_count, db_name)
+        if document_id is None:
+            continue
+        logger.info(f"Document {document_id}: {path} ({page_count} pages)")
+        for number in range(1, page_count + 1):
+            yield Page(document_id, path, number)
+
+if __name__ == '__main__':
+    from batch_ocr import ocr_images
+    parser = argparse.ArgumentParser(description='OCR multi-page TIFF or PDF documents, printing pages as they finish.')
+    parser.add_argument('paths', nargs='+', help='Documents (or images) to OCR')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed per page')
+    args = parser.parse_args()
+
+    def show(result):
+        status = result['error'] or f"{len(result['text'])} characters"
+        print(f"{result['image_path']}: {status}", flush=True)
+
+    # Results are stored after every page so the pages table fills in as the run goes
+    ocr_images(expand_documents(args.paths), workers=args.workers, timeout=args.timeout,
+               batch_size=1, on_result=show)
@@ -0,0 +1,91 @@
+import argparse
+import glob
+import os
+import time
+from ocr_processor import current_backend, decode_image, read_image_bytes
+from preprocessing import Pipeline
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def char_error_rate(text, reference):
+    """Edits needed to turn text into reference, per reference character (whitespace-normalized)."""
+    text, reference = ' '.join(text.split()), ' '.join(reference.split())
+    return edit_distance(text, reference) / max(len(reference), 1)
+
+def ground_truth(image_path):
+    """Reference text from image.gt.txt or image.txt next to the image, if any."""
+    stem = os.path.splitext(image_path)[0]
+    for path in (f"{stem}.gt.txt", f"{stem}.txt"):
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+    return None
+
+def evaluate(pipeline, images, backend):
+    """OCR every image with one pipeline; returns per-image texts and timing totals."""
+    totals = {'preprocess': 0.0, 'ocr': 0.0, 'pixels': 0}
+    stages = {}
+    texts = []
+    for image in images:
+        start = time.perf_counter()
+        processed, timings = pipeline.run(image)
+        totals['preprocess'] += time.perf_counter() - start
+        for stage, seconds in timings.items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        totals['pixels'] += processed.shape[0] * processed.shape[1]
+        start = time.perf_counter()
+        texts.append(backend.image_to_text(processed).strip())
+        totals['ocr'] += time.perf_counter() - start
+    return texts, totals, stages
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare preprocessing pipelines on OCR time and accuracy.')
+    parser.add_argument('--images', default='static/images/*.png', help='Glob of images')
+    parser.add_argument('--pipelines', default='default',
+                        help="Comma-separated pipeline JSON files; 'default' is grayscale + Otsu threshold")
+    parser.add_argument('--limit', type=int, default=50, help='Images to evaluate')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.images))[:args.limit]
+    images = [decode_image(read_image_bytes(path)) for path in paths]
+    images = [(path, image) for path, image in zip(paths, images) if image is not None]
+    if not images:
+        print(f"No images match '{args.images}'.")
+        return
+    references = [ground_truth(path) for path, _ in images]
+    labelled = sum(reference is not None for reference in references)
+    print(f"{len(images)} images, {labelled} with ground truth (<image>.gt.txt or <image>.txt)")
+
+    backend = current_backend()
+    baseline = None
+    for name in args.pipelines.split(','):
+        pipeline = Pipeline() if name == 'default' else Pipeline.from_file(name)
+        texts, totals, stages = evaluate(pipeline, [image for _, image in images], backend)
+        count = len(images)
+        print(f"\n[{name}] preprocess {totals['preprocess'] / count * 1000:.1f} ms, "
+              f"OCR {totals['ocr'] / count * 1000:.1f} ms per image, "
+              f"{totals['pixels'] / count / 1e6:.2f} Mpx after preprocessing")
+        for stage, seconds in stages.items():
+            print(f"    {stage:<10} {seconds / count * 1000:8.2f} ms/image")
+        scored = [char_error_rate(text, reference) for text, reference in zip(texts, references) if reference is not None]
+        if scored:
+            print(f"    character error rate {sum(scored) / len(scored):.3f} over {len(scored)} images")
+        # Without ground truth, show how far each pipeline drifts from the first one
+        if baseline is None:
+            baseline = (name, texts)
+        else:
+            drift = [char_error_rate(text, reference) for text, reference in zip(texts, baseline[1])]
+            print(f"    differs from {baseline[0]} by {sum(drift) / len(drift):.3f} (character error rate)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+import io
+import os
+import sys
+import json
+import logging
+import zipfile
+import argparse
+from datetime import datetime
+from database import DB_NAME, get_connection, fts_query
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only Parquet export needs it
+    pa = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'zip': ('application/zip', 'zip'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+# Rows fetched per query; memory use depends on this, not on the size of the export
+BATCH_SIZE = 500
+
+def parse_time(value):
+    """
+    Seconds since the epoch from a date ('2025-01-31'), an ISO timestamp or a number.
+    Returns:
+        float: Timestamp, or None for an empty value
+    Raises:
+        ValueError: If value is none of these
+    """
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def iter_results(since=None, until=None, errors=None, query=None, batch_size=BATCH_SIZE, db_name=DB_NAME):
+    """
+    Yield OCR results in ID order, one batch at a time.
+    Each batch is its own keyset query (id > last ID seen), so no read
+    transaction stays open while a slow client downloads and only one batch
+    is held in memory.
+    Args:
+        since (float): Only results created at or after this timestamp
+        until (float): Only results created before this timestamp
+        errors (str): 'only' for failed results, 'exclude' for successful ones, None for both
+        query (str): Only results whose text matches this full-text search
+        batch_size (int): Rows per query
+        db_name (str): Path to the SQLite database
+    Yields:
+        list: Dicts with id, image_path, text, error and created
+    """
+    conditions, params = [], []
+    if since is not None:
+        conditions.append('r.created >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('r.created < ?')
+        params.append(until)
+    if errors == 'only':
+        conditions.append('r.error IS NOT NULL')
+    elif errors == 'exclude':
+        conditions.append('r.error IS NULL')
+    source, key = 'ocr_results r', 'r.id'
+    if query:
+        match = fts_query(query)
+        if not match:
+            return
+        # Range and order on the FTS rowid so FTS5 seeks to the batch instead of
+        # re-reading every match from the start for each batch
+        source, key = 'ocr_results_fts JOIN ocr_results r ON r.id = ocr_results_fts.rowid', 'ocr_results_fts.rowid'
+        conditions.append('ocr_results_fts MATCH ?')
+        params.append(match)
+    where = ''.join(f" AND {condition}" for condition in conditions)
+    sql = (f"SELECT r.id, r.image_path, r.text, r.error, r.created FROM {source} "
+           f"WHERE {key} > ?{where} ORDER BY {key} LIMIT ?")
+
+    conn = get_connection(db_name)
+    last_id = 0
+    while True:
+        rows = conn.execute(sql, [last_id] + params + [batch_size]).fetchall()
+        if not rows:
+            return
+        yield [dict(zip(('id', 'image_path', 'text', 'error', 'created'), row)) for row in rows]
+        last_id = rows[-1][0]
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file that hands written bytes back to the caller in chunks."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def _jsonl(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in batch).encode('utf-8')
+
+def _zip(batches):
+    sink = _ChunkSink()
+    # zipfile streams to unseekable files, writing each entry's sizes after its data
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for batch in batches:
+            for result in batch:
+                if result['error'] is None:
+                    name = f"{result['id']}_{os.path.basename(result['image_path'] or 'result')}.txt"
+                    archive.writestr(name, result['text'] or '')
+            yield sink.drain()
+    yield sink.drain()
+
+def _parquet(batches):
+    schema = pa.schema([('id', pa.int64()), ('image_path', pa.string()), ('text', pa.string()),
+                        ('error', pa.string()), ('created', pa.float64())])
+    sink = _ChunkSink()
+    # One row group per batch; the footer that indexes them is written last
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+def export_results(fmt, since=None, until=None, errors=None, query=None, db_name=DB_NAME):
+    """
+    Stream matching OCR results in an export format.
+    Args:
+        fmt (str): 'jsonl' (one JSON object per line), 'zip' (a .txt file per successful result)
+            or 'parquet' (needs pyarrow)
+        since, until, errors, query: Filters, as for iter_results
+        db_name (str): Path to the SQLite database
+    Returns:
+        generator: Chunks of bytes; concatenated, they are the complete file
+    """
+    writers = {'jsonl': _jsonl, 'zip': _zip, 'parquet': _parquet}
+    if fmt not in writers:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(writers)}")
+    if errors not in (None, 'only', 'exclude'):
+        raise ValueError(f"errors must be 'only' or 'exclude', not '{errors}'")
+    if fmt == 'parquet' and pa is None:
+        # Fail before a streaming response has started
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+    return writers[fmt](iter_results(since, until, errors, query, db_name=db_name))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export OCR results as JSONL, a zip of .txt files, or Parquet.')
+    parser.add_argument('--format', choices=list(FORMATS), default='jsonl', help='Export format')
+    parser.add_argument('--output', default='-', help="Output file ('-' for stdout)")
+    parser.add_argument('--since', help='Only results created on or after this date/time (ISO) or timestamp')
+    parser.add_argument('--until', help='Only results created before this date/time (ISO) or timestamp')
+    parser.add_argument('--errors', choices=['only', 'exclude'], help='Only failed, or only successful, results')
+    parser.add_argument('--query', help='Only results matching this full-text search')
+    parser.add_argument('--db', default=DB_NAME, help='SQLite database path')
+    args = parser.parse_args()
+
+    chunks = export_results(args.format, parse_time(args.since), parse_time(args.until), args.errors, args.query, args.db)
+    out = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
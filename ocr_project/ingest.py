@@ -0,0 +1,234 @@
+import os
+import time
+import logging
+import argparse
+from itertools import chain, islice
+from batch_ocr import ocr_images, INPUT_EXTENSIONS
+from database import DB_NAME, get_connection
+from documents import expand_documents, is_document
+from ocr_cache import content_hash
+from preprocessing import Pipeline
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Files modified more recently than this may still be being copied in; they wait for the next pass
+SETTLE_SECONDS = 2
+# Seconds between directory scans in watch mode
+WATCH_INTERVAL = 10
+
+def scan_tree(root, extensions=INPUT_EXTENSIONS):
+    """
+    Yield matching files under root, including subdirectories, as they are found.
+    Uses os.scandir, whose entries carry the file type and (on Windows) its stat
+    result, and never lists a whole directory or tree up front.
+    Args:
+        root (str): Directory to scan
+        extensions (tuple): Lower-case file extensions to include
+    Yields:
+        tuple: (path, os.stat_result)
+    """
+    directories = [root]
+    while directories:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(extensions):
+                        yield entry.path, entry.stat()
+        except OSError as e:
+            logger.warning(f"Cannot scan {directory}: {e}")
+
+class IngestTracker:
+    """
+    Decides which files need OCR and records them in ingested_files once their
+    results are stored, so the next pass skips them until they change.
+    A file that is interrupted mid-run, whose results could not be stored, or
+    that timed out or crashed its worker (for a document, on any page) is
+    simply OCR'd again on the next pass.
+    Args:
+        db_name (str): Path to the SQLite database
+        verify_hash (bool): When a known file's mtime changed but its size didn't,
+            compare content hashes before OCRing it again (e.g. after a copy or touch)
+    """
+
+    def __init__(self, db_name=DB_NAME, verify_hash=False):
+        self.db_name = db_name
+        self.verify_hash = verify_hash
+        # Files handed to OCR but not yet recorded: path -> (mtime, size)
+        self.in_flight = {}
+        # Documents with pages still to be stored: document ID -> [path, pages left, any page transient]
+        self.pages_left = {}
+        self.recorded = 0
+
+    def _record(self, rows):
+        if not rows:
+            return
+        conn = get_connection(self.db_name)
+        with conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO ingested_files (path, mtime, size, content_hash, ingested)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+        self.recorded += len(rows)
+
+    def _unchanged(self, path, stat):
+        row = get_connection(self.db_name).execute('SELECT mtime, size, content_hash FROM ingested_files WHERE path = ?',
+                                                   (path,)).fetchone()
+        if row is None:
+            return False
+        mtime, size, digest = row
+        if mtime == stat.st_mtime and size == stat.st_size:
+            return True
+        if self.verify_hash and digest and size == stat.st_size:
+            with open(path, 'rb') as f:
+                if content_hash(f.read()) == digest:
+                    # Same content under a new mtime: remember the new stat, skip the OCR
+                    self._record([(path, stat.st_mtime, stat.st_size, digest, time.time())])
+                    return True
+        return False
+
+    def changed_files(self, root, settle=SETTLE_SECONDS):
+        """
+        Yield files under root that are new or changed since they were last ingested.
+        Args:
+            root (str): Directory to scan
+            settle (float): Skip files modified less than this many seconds ago
+        Yields:
+            str: File path
+        """
+        for path, stat in scan_tree(root):
+            if path in self.in_flight or time.time() - stat.st_mtime < settle:
+                continue
+            if self._unchanged(path, stat):
+                continue
+            self.in_flight[path] = (stat.st_mtime, stat.st_size)
+            yield path
+
+    def ocr_items(self, paths):
+        """Images as they are and documents as pages (see documents.expand_documents), tracking each document's pages."""
+        for path in paths:
+            if not is_document(path):
+                yield path
+                continue
+            pages = expand_documents([path], self.db_name)
+            first = next(pages, None)
+            if first is None:
+                # Unreadable: record it anyway so it isn't retried until it changes
+                self.stored([{'image_path': path, 'error': 'unreadable'}])
+                continue
+            page_count = get_connection(self.db_name).execute('SELECT page_count FROM documents WHERE id = ?',
+                                                              (first.document_id,)).fetchone()[0]
+            self.pages_left[first.document_id] = [path, page_count, False]
+            yield from chain([first], pages)
+
+    def stored(self, results):
+        """
+        ocr_images on_flush callback: record files whose results (every page, for
+        documents) are now stored, except those that timed out or crashed.
+        """
+        rows = []
+        for result in results:
+            digest = result.get('content_hash')
+            transient = result.get('transient', False)
+            if 'document_id' in result:
+                entry = self.pages_left.get(result['document_id'])
+                if entry is None:
+                    continue
+                entry[1] -= 1
+                entry[2] = entry[2] or transient
+                if entry[1] > 0:
+                    continue
+                del self.pages_left[result['document_id']]
+                path, _, transient = entry
+                # Page results carry their page image's hash; verify_hash compares whole files
+                try:
+                    with open(path, 'rb') as f:
+                        digest = content_hash(f.read())
+                except OSError:
+                    digest = None
+            else:
+                path = result['image_path']
+            # Dropped from in_flight either way, so a transient failure is picked up again next pass
+            stat = self.in_flight.pop(path, None)
+            if stat is not None and not transient:
+                rows.append((path, stat[0], stat[1], digest, time.time()))
+        self._record(rows)
+
+def ingest_directory(root, tracker=None, max_files=None, workers=None, max_in_flight=None, timeout=120,
+                     batch_size=50, pipeline=None, settle=SETTLE_SECONDS):
+    """
+    OCR only the files under root that are new or changed since the last ingest.
+    Args:
+        root (str): Directory of images and documents (scanned recursively)
+        tracker (IngestTracker): Tracker to use, which also names the database (defaults to one for DB_NAME)
+        max_files (int): Stop after this many files (None for all)
+        workers (int): Worker processes (defaults to the CPU count)
+        max_in_flight (int): Images queued to the pool at once (defaults to 2 x workers)
+        timeout (float): Seconds allowed per image or page
+        batch_size (int): Results per database transaction
+        pipeline (Pipeline): Preprocessing stages (defaults to root/pipeline.json if present)
+        settle (float): Skip files modified less than this many seconds ago
+    Returns:
+        dict: Run summary from BatchStats.summary plus files recorded, or None if nothing needed OCR
+    """
+    tracker = tracker or IngestTracker()
+    changed = tracker.changed_files(root, settle)
+    if max_files is not None:
+        changed = islice(changed, max_files)
+    # Only start a worker pool when there is something to do
+    first = next(changed, None)
+    if first is None:
+        return None
+    if pipeline is None:
+        pipeline = Pipeline.for_dataset(root)
+    summary = ocr_images(tracker.ocr_items(chain([first], changed)), workers=workers, max_in_flight=max_in_flight,
+                         timeout=timeout, batch_size=batch_size, db_name=tracker.db_name, pipeline=pipeline, on_flush=tracker.stored)
+    # Whatever is left was never stored (a failed transaction); forget it so the next pass retries it
+    tracker.in_flight.clear()
+    tracker.pages_left.clear()
+    summary['files'] = tracker.recorded
+    logger.info(f"Ingested {tracker.recorded} new or changed files from {root}")
+    return summary
+
+def watch(root, interval=WATCH_INTERVAL, verify_hash=False, db_name=DB_NAME, **kwargs):
+    """
+    Keep ingesting new and changed files under root until interrupted.
+    Each pass scans the tree and OCRs what changed; files still being written
+    (modified within the settle time) are picked up on a later pass.
+    Args:
+        root (str): Directory to watch
+        interval (float): Seconds between scans
+        verify_hash (bool): See IngestTracker
+        db_name (str): Path to the SQLite database
+        **kwargs: Passed to ingest_directory
+    """
+    tracker = IngestTracker(db_name, verify_hash)
+    logger.info(f"Watching {root} every {interval}s")
+    try:
+        while True:
+            tracker.recorded = 0
+            ingest_directory(root, tracker, **kwargs)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='OCR only new or changed images and documents in a directory tree.')
+    parser.add_argument('root', nargs='?', default='static/images', help='Directory to ingest')
+    parser.add_argument('--watch', action='store_true', help='Keep running and ingest files as they arrive')
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL, help='Seconds between scans in watch mode')
+    parser.add_argument('--verify-hash', action='store_true', help='Skip files whose content is unchanged despite a new mtime')
+    parser.add_argument('--max-files', type=int, help='Stop after this many files per pass')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed per image or page')
+    parser.add_argument('--db', default=DB_NAME, help='SQLite database path')
+    args = parser.parse_args()
+    options = {'max_files': args.max_files, 'workers': args.workers, 'timeout': args.timeout}
+    if args.watch:
+        watch(args.root, args.interval, args.verify_hash, args.db, **options)
+    else:
+        ingest_directory(args.root, IngestTracker(args.db, args.verify_hash), **options)
@@ -0,0 +1,315 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from database import get_connection, insert_document, insert_ocr_result, insert_page_results
+from documents import Page, ocr_page
+from ocr_processor import extract_text
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DB_NAME = 'data/ocr_data.db'
+MAX_QUEUED = 100
+POLL_INTERVAL = 0.5
+# Workers refresh the heartbeat of the job they are running this often
+HEARTBEAT_INTERVAL = 30
+# Running jobs whose heartbeat is older than this (their worker was killed) are queued again
+STALE_AFTER = 4 * HEARTBEAT_INTERVAL
+# A job whose worker died this many times is failed instead of queued again
+MAX_ATTEMPTS = 3
+# Seconds between checks for dead worker processes
+SUPERVISE_INTERVAL = 5
+
+class QueueFullError(Exception):
+    """Raised by enqueue_job and enqueue_document when max_queued jobs are already waiting."""
+
+def init_queue(db_name=DB_NAME):
+    """Open the database, creating the ocr_jobs table (database migration 5) if needed."""
+    get_connection(db_name)
+
+def enqueue_job(image_path, db_name=DB_NAME, max_queued=MAX_QUEUED, image_data=None):
+    """
+    Queue an image for OCR.
+    Args:
+        image_path (str): Path of the image (where the original is or will be saved)
+        db_name (str): Path to the SQLite database
+        max_queued (int): Refuse new jobs while this many are waiting
+        image_data (bytes-like): Encoded image held in memory; workers OCR it instead of
+            reading image_path, which need not exist yet
+    Returns:
+        int: Job ID
+    Raises:
+        QueueFullError: If the queue is at max_queued
+    """
+    conn = get_connection(db_name)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        queued = conn.execute("SELECT COUNT(*) FROM ocr_jobs WHERE status = 'queued'").fetchone()[0]
+        if queued >= max_queued:
+            raise QueueFullError(f"{queued} OCR jobs already queued")
+        job_id = conn.execute('INSERT INTO ocr_jobs (image_path, image_data, created) VALUES (?, ?, ?)',
+                              (image_path, image_data, time.time())).lastrowid
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    logger.info(f"Queued OCR job {job_id} for {image_path}")
+    return job_id
+
+def enqueue_document(path, page_count, db_name=DB_NAME, max_queued=MAX_QUEUED):
+    """
+    Queue every page of a multi-page document as its own job, so idle workers
+    OCR its pages in parallel and finished pages can be read before the rest.
+    Args:
+        path (str): Path of the saved TIFF or PDF (workers render pages from it)
+        page_count (int): Number of pages
+        db_name (str): Path to the SQLite database
+        max_queued (int): Refuse the document while this many jobs are waiting
+    Returns:
+        int: Document ID
+    Raises:
+        QueueFullError: If the queue is at max_queued
+    """
+    conn = get_connection(db_name)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        queued = conn.execute("SELECT COUNT(*) FROM ocr_jobs WHERE status = 'queued'").fetchone()[0]
+        # A long document may take the queue past max_queued; it is only refused once the queue is full
+        if queued >= max_queued:
+            raise QueueFullError(f"{queued} OCR jobs already queued")
+        document_id = insert_document(conn, path, page_count)
+        now = time.time()
+        conn.executemany('INSERT INTO ocr_jobs (image_path, document_id, page_number, created) VALUES (?, ?, ?, ?)',
+                         [(path, document_id, number, now) for number in range(1, page_count + 1)])
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    logger.info(f"Queued document {document_id} ({page_count} pages) for {path}")
+    return document_id
+
+def claim_job(conn, worker):
+    """
+    Take the oldest queued job and mark it running.
+    Returns:
+        tuple: (job ID, image path, image bytes or None, document ID, page number),
+               or None if the queue is empty; the last two are None for single images
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute("SELECT id, image_path, image_data, document_id, page_number FROM ocr_jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row:
+            now = time.time()
+            conn.execute("UPDATE ocr_jobs SET status = 'running', worker = ?, started = ?, heartbeat = ?, "
+                         "attempts = attempts + 1 WHERE id = ?", (worker, now, now, row[0]))
+        conn.execute('COMMIT')
+        return row
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def _store_job_result(conn, job_id, result):
+    """
+    Store a job's OCR result and mark the job done (or failed); the caller commits.
+    Image results go to ocr_results; document pages go to the pages table.
+    """
+    if 'document_id' in result:
+        insert_page_results(conn, [result])
+        result_id = None
+    else:
+        result_id = insert_ocr_result(conn, result)
+    # The image bytes are only needed until the job is done
+    conn.execute('UPDATE ocr_jobs SET status = ?, result_id = ?, error = ?, finished = ?, image_data = NULL WHERE id = ?',
+                 ('failed' if result['error'] else 'done', result_id, result['error'], time.time(), job_id))
+
+def complete_job(conn, job_id, result):
+    """Store the OCR result and mark the job done (or failed) in one transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _store_job_result(conn, job_id, result)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def renew_heartbeat(conn, job_id):
+    """Record that a running job's worker is still alive."""
+    with conn:
+        conn.execute("UPDATE ocr_jobs SET heartbeat = ? WHERE id = ? AND status = 'running'", (time.time(), job_id))
+
+def requeue_stale_jobs(db_name=DB_NAME, stale_after=STALE_AFTER, max_attempts=MAX_ATTEMPTS):
+    """
+    Put jobs whose worker died mid-run back in the queue.
+    A live worker renews its job's heartbeat every HEARTBEAT_INTERVAL seconds
+    however long the OCR takes, so only jobs of dead workers go stale. A job
+    that has already killed max_attempts workers (e.g. an image that crashes
+    Tesseract or exhausts memory) is failed with an error instead, so it
+    cannot take down workers forever.
+    Returns:
+        int: Number of jobs queued again
+    """
+    conn = get_connection(db_name)
+    cutoff = time.time() - stale_after
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        poisoned = conn.execute("SELECT id, image_path, document_id, page_number, attempts FROM ocr_jobs "
+                                "WHERE status = 'running' AND COALESCE(heartbeat, started) < ? AND attempts >= ?",
+                                (cutoff, max_attempts)).fetchall()
+        for job_id, image_path, document_id, page_number, attempts in poisoned:
+            result = {'image_path': image_path, 'text': 'N/A', 'error': f"OCR worker died on each of {attempts} attempts"}
+            if document_id is not None:
+                result.update(document_id=document_id, page_number=page_number)
+            _store_job_result(conn, job_id, result)
+        count = conn.execute("UPDATE ocr_jobs SET status = 'queued', worker = NULL, started = NULL, heartbeat = NULL "
+                             "WHERE status = 'running' AND COALESCE(heartbeat, started) < ?", (cutoff,)).rowcount
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    if poisoned:
+        logger.error(f"Failed OCR jobs {[row[0] for row in poisoned]} after their worker died {max_attempts} times")
+    if count:
+        logger.warning(f"Requeued {count} stale OCR jobs")
+    return count
+
+def get_job(job_id, db_name=DB_NAME, include_text=False):
+    """
+    Look up a job.
+    Args:
+        job_id (int): Job ID
+        db_name (str): Path to the SQLite database
+        include_text (bool): Include the OCR text once the job is done
+    Returns:
+        dict: id, image_path, status, error, timestamps (and text); None if unknown
+    """
+    row = get_connection(db_name).execute('''
+        SELECT j.id, j.image_path, j.status, j.error, j.created, j.started, j.finished, r.text
+        FROM ocr_jobs j LEFT JOIN ocr_results r ON r.id = j.result_id
+        WHERE j.id = ?
+    ''', (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(('id', 'image_path', 'status', 'error', 'created', 'started', 'finished'), row[:7]))
+    if include_text:
+        job['text'] = row[7]
+    return job
+
+def queue_counts(db_name=DB_NAME):
+    """Number of jobs per status, e.g. {'queued': 3, 'running': 2}."""
+    return dict(get_connection(db_name).execute('SELECT status, COUNT(*) FROM ocr_jobs GROUP BY status').fetchall())
+
+def run_worker(db_name=DB_NAME, poll_interval=POLL_INTERVAL, stop_event=None):
+    """
+    Process queued jobs until stop_event is set (or forever).
+    Args:
+        db_name (str): Path to the SQLite database
+        poll_interval (float): Seconds to sleep when the queue is empty
+        stop_event (multiprocessing.Event): Set to stop after the current job
+    """
+    worker = f"pid {os.getpid()}"
+    conn = get_connection(db_name)
+    next_stale_check = 0
+    # The job being OCR'd; a background thread keeps its heartbeat fresh
+    current = {'job_id': None}
+
+    def heartbeat():
+        # get_connection gives this thread its own connection
+        heartbeat_conn = get_connection(db_name)
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            job_id = current['job_id']
+            if job_id is None:
+                continue
+            try:
+                renew_heartbeat(heartbeat_conn, job_id)
+            except sqlite3.Error as e:
+                logger.warning(f"OCR worker {worker} could not renew job {job_id}: {e}")
+
+    threading.Thread(target=heartbeat, name='ocr-heartbeat', daemon=True).start()
+    logger.info(f"OCR worker {worker} started")
+    while stop_event is None or not stop_event.is_set():
+        try:
+            current['job_id'] = None
+            job = claim_job(conn, worker)
+            if job is None:
+                # Idle workers recover jobs abandoned by workers that died
+                if time.monotonic() >= next_stale_check:
+                    requeue_stale_jobs(db_name)
+                    next_stale_check = time.monotonic() + STALE_AFTER / 10
+                time.sleep(poll_interval)
+                continue
+            job_id, image_path, image_data, document_id, page_number = job
+            current['job_id'] = job_id
+            if document_id is not None:
+                result = ocr_page(Page(document_id, image_path, page_number))
+            else:
+                result = extract_text(image_path if image_data is None else image_data, image_path=image_path)
+            complete_job(conn, job_id, result)
+            logger.info(f"OCR job {job_id} finished ({'failed' if result['error'] else 'done'})")
+        except sqlite3.Error as e:
+            logger.error(f"OCR worker {worker} database error: {e}")
+            time.sleep(poll_interval)
+
+def start_workers(count, db_name=DB_NAME):
+    """
+    Start worker processes for the queue.
+    Args:
+        count (int): Number of worker processes
+        db_name (str): Path to the SQLite database
+    Returns:
+        tuple: (list of processes, stop event)
+    """
+    init_queue(db_name)
+    stop_event = multiprocessing.Event()
+    processes = [_start_worker(db_name, stop_event) for _ in range(count)]
+    logger.info(f"Started {count} OCR workers")
+    return processes, stop_event
+
+def _start_worker(db_name, stop_event):
+    process = multiprocessing.Process(target=run_worker, args=(db_name, POLL_INTERVAL, stop_event), daemon=True)
+    process.start()
+    return process
+
+def replace_dead_workers(processes, stop_event, db_name=DB_NAME):
+    """
+    Start a new worker in place of each one that exited (e.g. killed by the OOM
+    killer or a crash in Tesseract); the job it was running is queued again once stale.
+    Args:
+        processes (list): Worker processes from start_workers, updated in place
+        stop_event (multiprocessing.Event): The workers' stop event; nothing is replaced once it is set
+        db_name (str): Path to the SQLite database
+    Returns:
+        int: Number of workers replaced
+    """
+    replaced = 0
+    for index, process in enumerate(processes):
+        if process.is_alive() or stop_event.is_set():
+            continue
+        logger.warning(f"OCR worker pid {process.pid} exited with code {process.exitcode}; starting a replacement")
+        process.join()
+        processes[index] = _start_worker(db_name, stop_event)
+        replaced += 1
+    return replaced
+
+def supervise_workers(processes, stop_event, db_name=DB_NAME, interval=SUPERVISE_INTERVAL):
+    """Replace dead workers every interval seconds until stop_event is set."""
+    while not stop_event.wait(interval):
+        replace_dead_workers(processes, stop_event, db_name)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run OCR queue workers.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--db', default=DB_NAME, help='SQLite database path')
+    args = parser.parse_args()
+    processes, stop_event = start_workers(args.workers, args.db)
+    try:
+        supervise_workers(processes, stop_event, args.db)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for process in processes:
+            process.join()
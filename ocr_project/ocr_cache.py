@@ -0,0 +1,150 @@
+import hashlib
+import json
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from database import get_connection
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DB_NAME = 'data/ocr_data.db'
+
+def content_hash(data):
+    """SHA-256 hex digest of image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def config_key(config):
+    """
+    Stable key for an OCR configuration.
+    Args:
+        config (dict): Everything that affects the output (engine, psm/oem, preprocessing parameters)
+    Returns:
+        str: Short hex digest; any change to config gives a new key
+    """
+    encoded = json.dumps(config, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]
+
+class OCRCache:
+    """
+    OCR results keyed by (image content hash, config key), stored in the
+    ocr_cache table with an in-process LRU in front of it.
+    Args:
+        db_name (str): Path to the SQLite database
+        max_entries (int): Results held in memory
+    """
+
+    def __init__(self, db_name=DB_NAME, max_entries=1024):
+        self.db_name = db_name
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        """This thread's shared database connection (see database.get_connection)."""
+        return get_connection(self.db_name)
+
+    def _remember(self, key, text):
+        self.memory[key] = text
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, digest, config):
+        """
+        Look up cached text.
+        Args:
+            digest (str): Image content hash
+            config (str): Config key
+        Returns:
+            str: Cached text, or None on a miss
+        """
+        key = (digest, config)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+        try:
+            row = self._connect().execute('SELECT text FROM ocr_cache WHERE content_hash = ? AND config_key = ?', key).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"OCR cache lookup failed: {e}")
+            row = None
+        with self.lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db_hits += 1
+            self._remember(key, row[0])
+        return row[0]
+
+    def put(self, digest, config, text):
+        """Store text for an image hash and config key."""
+        key = (digest, config)
+        with self.lock:
+            self._remember(key, text)
+        try:
+            with self._connect() as conn:
+                conn.execute('INSERT OR REPLACE INTO ocr_cache (content_hash, config_key, text) VALUES (?, ?, ?)', (digest, config, text))
+        except sqlite3.Error as e:
+            logger.error(f"OCR cache store failed: {e}")
+
+    def invalidate(self, keep_configs=None):
+        """
+        Drop cached results.
+        Args:
+            keep_configs (list): Keep entries for these config keys (e.g. the current ones) and drop the rest;
+                                 None drops everything
+        Returns:
+            int: Rows deleted from the database
+        """
+        keep = list(keep_configs or [])
+        with self.lock:
+            self.memory = OrderedDict((key, text) for key, text in self.memory.items() if key[1] in keep)
+        with self._connect() as conn:
+            placeholders = ', '.join('?' * len(keep))
+            deleted = conn.execute(f"DELETE FROM ocr_cache WHERE config_key NOT IN ({placeholders})", keep).rowcount
+        logger.info(f"Invalidated {deleted} cached OCR results")
+        return deleted
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits (of which db_hits came from SQLite), misses, hit_rate and in-memory entries
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+            }
+
+if __name__ == '__main__':
+    import argparse
+    from ocr_processor import current_config_key
+    from preprocessing import Pipeline
+    parser = argparse.ArgumentParser(description='Manage the OCR result cache.')
+    parser.add_argument('command', choices=['stats', 'prune', 'clear'],
+                        help='stats: entries per config; prune: drop entries for other configs; clear: drop everything')
+    parser.add_argument('--db', default=DB_NAME, help='SQLite database path')
+    parser.add_argument('--pipeline', action='append', default=[],
+                        help='pipeline.json still in use (repeatable); its entries count as current')
+    args = parser.parse_args()
+    cache = OCRCache(args.db)
+    current = [current_config_key()] + [current_config_key(Pipeline.from_file(path)) for path in args.pipeline]
+    if args.command == 'stats':
+        for key, count in cache._connect().execute('SELECT config_key, COUNT(*) FROM ocr_cache GROUP BY config_key'):
+            print(f"{key}  {count:>8} results{'  (current)' if key in current else ''}")
+    elif args.command == 'prune':
+        cache.invalidate(keep_configs=current)
+    else:
+        cache.invalidate()
@@ -1,57 +1,237 @@
 import cv2
+import numpy as np
 import pytesseract
 from PIL import Image
 import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from ocr_cache import OCRCache, config_key, content_hash
+from preprocessing import Pipeline, StageCache
+
+try:
+    import tesserocr
+except ImportError:  # tesserocr is optional; pytesseract always works
+    tesserocr = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def preprocess_image(image_path):
+# Tesseract settings; these and the preprocessing pipeline make up the OCR cache key
+OCR_CONFIG = {'oem': 3, 'psm': 6}
+
+# 'auto' uses tesserocr when installed, else pytesseract
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'auto')
+
+_cache = None
+_config_keys = {}
+_backend = None
+_stage_cache = None
+DEFAULT_PIPELINE = Pipeline()
+
+class OCRBackend(ABC):
+    """Base class: run Tesseract on a preprocessed (grayscale or binary) image array."""
+    name = None
+
+    @abstractmethod
+    def image_to_text(self, image, timeout=0):
+        """OCR an image array, returning its text."""
+
+    @abstractmethod
+    def version(self):
+        """Tesseract version string, part of the OCR cache key."""
+
+class PytesseractBackend(OCRBackend):
+    """Runs the tesseract command per image: process startup, model load and a temp file each call."""
+    name = 'pytesseract'
+
+    def image_to_text(self, image, timeout=0):
+        custom_config = f"--oem {OCR_CONFIG['oem']} --psm {OCR_CONFIG['psm']}"  # Default OCR engine, assume block of text
+        return pytesseract.image_to_string(image, config=custom_config, timeout=timeout)
+
+    def version(self):
+        return str(pytesseract.get_tesseract_version())
+
+class TesserocrBackend(OCRBackend):
+    """
+    Keeps one Tesseract API instance loaded for the life of the process and
+    passes image buffers to it in memory. The timeout is not enforced here;
+    batch_ocr's per-image deadline still applies.
+    """
+    name = 'tesserocr'
+
+    def __init__(self):
+        if tesserocr is None:
+            raise ImportError('tesserocr is not installed')
+        self.api = tesserocr.PyTessBaseAPI(lang='eng', psm=OCR_CONFIG['psm'], oem=OCR_CONFIG['oem'])
+        # One API instance is not safe to share between threads
+        self.lock = threading.Lock()
+
+    def image_to_text(self, image, timeout=0):
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        with self.lock:
+            # tobytes() is C-contiguous even for cropped views, so rows are width * bytes_per_pixel apart
+            self.api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+            return self.api.GetUTF8Text()
+
+    def version(self):
+        return tesserocr.tesseract_version().split()[1]
+
+BACKENDS = {'pytesseract': PytesseractBackend, 'tesserocr': TesserocrBackend}
+
+def get_backend(name='auto'):
+    """
+    Return a new OCR backend by name.
+    Args:
+        name (str): 'tesserocr', 'pytesseract', or 'auto' (tesserocr if installed, else pytesseract)
+    Returns:
+        OCRBackend: Backend instance
+    """
+    if name == 'auto':
+        name = 'tesserocr' if tesserocr is not None else 'pytesseract'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+def current_backend():
+    """The process-wide OCR_BACKEND instance, loaded once per process."""
+    global _backend
+    if _backend is None:
+        _backend = get_backend(OCR_BACKEND)
+        logger.info(f"Using OCR backend {_backend.name}")
+    return _backend
+
+def current_config_key(pipeline=None):
+    """Cache key for OCR_CONFIG, the preprocessing pipeline, the OCR backend and the installed Tesseract version."""
+    pipeline_key = (pipeline or DEFAULT_PIPELINE).key()
+    if pipeline_key not in _config_keys:
+        backend = current_backend()
+        try:
+            version = backend.version()
+        except Exception:
+            version = 'unknown'
+        _config_keys[pipeline_key] = config_key(dict(OCR_CONFIG, preprocessing=pipeline_key,
+                                                     backend=backend.name, tesseract=version))
+    return _config_keys[pipeline_key]
+
+def get_stage_cache():
+    """The process-wide cache for pipeline steps marked 'cache', created on first use."""
+    global _stage_cache
+    if _stage_cache is None:
+        _stage_cache = StageCache()
+    return _stage_cache
+
+def get_cache(db_name='data/ocr_data.db'):
+    """The process-wide OCR result cache, created on first use."""
+    global _cache
+    if _cache is None or _cache.db_name != db_name:
+        _cache = OCRCache(db_name)
+    return _cache
+
+def read_image_bytes(image):
+    """Encoded image bytes from a path, or the bytes-like object itself."""
+    if isinstance(image, str):
+        with open(image, 'rb') as f:
+            return f.read()
+    return image
+
+def decode_image(data):
+    """Decode encoded image bytes (any bytes-like object, without copying it) into a BGR array."""
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+def preprocess_image(image, label=None, pipeline=None):
     """
     Preprocess image for better OCR accuracy.
     Args:
-        image_path (str): Path to the input image
+        image (str, bytes-like or np.ndarray): Image path, encoded image bytes or decoded BGR image
+        label (str): Name used in log messages (defaults to the path)
+        pipeline (Pipeline): Preprocessing stages (defaults to grayscale + Otsu threshold)
     Returns:
         Processed image
     """
+    return _preprocess(image, label, pipeline)[0]
+
+def _preprocess(image, label=None, pipeline=None, digest=None):
+    """preprocess_image, also returning seconds per stage; digest enables the stage cache."""
+    label = label or (image if isinstance(image, str) else 'image')
+    pipeline = pipeline or DEFAULT_PIPELINE
     try:
         # Read image with OpenCV
-        img = cv2.imread(image_path)
+        if isinstance(image, str):
+            img = cv2.imread(image)
+        elif isinstance(image, np.ndarray):
+            img = image
+        else:
+            img = decode_image(image)
         if img is None:
-            raise ValueError(f"Failed to load image: {image_path}")
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            raise ValueError(f"Failed to load image: {label}")
         
-        # Apply thresholding to enhance text
-        _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        return thresh
+        # Run the configured stages (grayscale and thresholding by default)
+        cache = get_stage_cache() if pipeline.caches and digest else None
+        return pipeline.run(img, digest, cache)
     except Exception as e:
-        logger.error(f"Preprocessing error for {image_path}: {e}")
-        return None
+        logger.error(f"Preprocessing error for {label}: {e}")
+        return None, {}
 
-def extract_text(image_path):
+def extract_text(image, timeout=0, use_cache=True, image_path=None, pipeline=None):
     """
     Extract text from an image using Tesseract OCR.
+    The image is read (or taken from memory) once, hashed and decoded from the
+    same buffer. Results are cached by image content, OCR_CONFIG and the
+    preprocessing pipeline, so an identical image is only OCR'd once.
     Args:
-        image_path (str): Path to the input image
+        image (str or bytes-like): Path to the input image, or its encoded bytes
+            (e.g. an upload held in memory)
+        timeout (float): Seconds before the Tesseract process is killed (0 for no limit; pytesseract backend only)
+        use_cache (bool): Look up and store results in the OCR cache
+        image_path (str): Path recorded with the result (defaults to image when it is a path)
+        pipeline (Pipeline): Preprocessing stages (defaults to grayscale + Otsu threshold)
     Returns:
-        dict: Extracted text and metadata
+        dict: Extracted text and metadata, with per-stage timings in seconds
+              (preprocess.<stage> for each preprocessing stage)
+              and cached=True when the text came from the cache; content_hash is the
+              image's SHA-256 when it was computed (always, with use_cache)
     """
+    if image_path is None:
+        image_path = image if isinstance(image, str) else 'upload'
+    timings = {}
+    digest = None
     try:
+        start = time.perf_counter()
+        data = read_image_bytes(image)
+        timings['read'] = time.perf_counter() - start
+        if use_cache or (pipeline and pipeline.caches):
+            start = time.perf_counter()
+            digest = content_hash(data)
+            timings['hash'] = time.perf_counter() - start
+        if use_cache:
+            text = get_cache().get(digest, current_config_key(pipeline))
+            if text is not None:
+                logger.info(f"Cache hit for {image_path}")
+                return {'image_path': image_path, 'text': text, 'error': None, 'timings': timings, 'cached': True,
+                        'content_hash': digest}
+        
         # Preprocess image
-        processed_img = preprocess_image(image_path)
+        start = time.perf_counter()
+        processed_img, stage_timings = _preprocess(data, image_path, pipeline, digest)
+        timings['preprocess'] = time.perf_counter() - start
+        timings.update((f"preprocess.{stage}", seconds) for stage, seconds in stage_timings.items())
         if processed_img is None:
-            return {'image_path': image_path, 'text': 'N/A', 'error': 'Image preprocessing failed'}
+            return {'image_path': image_path, 'text': 'N/A', 'error': 'Image preprocessing failed', 'timings': timings}
         
-        # Configure Tesseract
-        custom_config = r'--oem 3 --psm 6'  # Default OCR engine, assume block of text
-        text = pytesseract.image_to_string(processed_img, config=custom_config)
+        start = time.perf_counter()
+        text = current_backend().image_to_text(processed_img, timeout=timeout).strip()
+        timings['ocr'] = time.perf_counter() - start
         
+        # Only successful results are cached; failures may be transient
+        if use_cache:
+            get_cache().put(digest, current_config_key(pipeline), text)
         logger.info(f"Extracted text from {image_path}")
-        return {'image_path': image_path, 'text': text.strip(), 'error': None}
+        return {'image_path': image_path, 'text': text, 'error': None, 'timings': timings, 'cached': False,
+                'content_hash': digest}
     except Exception as e:
         logger.error(f"OCR error for {image_path}: {e}")
-        return {'image_path': image_path, 'text': 'N/A', 'error': str(e)}
\ No newline at end of file
+        return {'image_path': image_path, 'text': 'N/A', 'error': str(e), 'timings': timings}
\ No newline at end of file
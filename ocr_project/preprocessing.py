@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from ocr_cache import config_key
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Same result as the original fixed preprocessing: grayscale, then Otsu threshold
+DEFAULT_PIPELINE = [
+    {'stage': 'grayscale'},
+    {'stage': 'threshold', 'method': 'otsu'},
+]
+
+# Per-dataset pipelines are read from this file in the image directory
+PIPELINE_FILE = 'pipeline.json'
+STAGE_CACHE_DIR = 'data/preprocess_cache'
+
+def _gray(img):
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def _text_mask(img):
+    """White-on-black mask of dark (text) pixels."""
+    _, mask = cv2.threshold(_gray(img), 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return mask
+
+def grayscale(img):
+    """Convert to a single channel."""
+    return _gray(img)
+
+def downscale(img, source_dpi=None, target_dpi=300, max_side=None):
+    """
+    Shrink oversized scans; never enlarges.
+    Args:
+        source_dpi (int): Scan resolution; with target_dpi gives the scale factor
+        target_dpi (int): Resolution Tesseract works well at (around 300)
+        max_side (int): Also cap the longest side at this many pixels
+    """
+    scale = 1.0
+    if source_dpi:
+        scale = min(scale, target_dpi / source_dpi)
+    if max_side:
+        scale = min(scale, max_side / max(img.shape[:2]))
+    if scale >= 1.0:
+        return img
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+def deskew(img, max_angle=15, min_angle=0.2):
+    """
+    Rotate the page so text lines are horizontal.
+    The skew is the angle of the minimum-area rectangle around all text pixels;
+    angles beyond max_angle are treated as a misdetection and left alone.
+    """
+    coords = cv2.findNonZero(_text_mask(img))
+    if coords is None:
+        return img
+    # Measure an edge of the box directly: the angle minAreaRect reports uses
+    # different ranges across OpenCV versions. Edges are 90 degrees apart, so
+    # fold into (-45, 45]; positive means lines run down to the right.
+    corners = cv2.boxPoints(cv2.minAreaRect(coords))
+    dx, dy = corners[1] - corners[0]
+    angle = (np.degrees(np.arctan2(dy, dx)) + 45) % 90 - 45
+    if abs(angle) < min_angle or abs(angle) > max_angle:
+        return img
+    height, width = img.shape[:2]
+    # A positive angle here rotates counter-clockwise, undoing a clockwise skew
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), float(angle), 1.0)
+    return cv2.warpAffine(img, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def denoise(img, method='median', strength=3):
+    """
+    Remove speckle noise.
+    Args:
+        method (str): 'median' (fast, strength is the kernel size) or 'nlmeans' (slower, strength is the filter strength)
+    """
+    if method == 'nlmeans':
+        return cv2.fastNlMeansDenoising(_gray(img), None, strength)
+    return cv2.medianBlur(img, strength)
+
+def threshold(img, method='otsu', block_size=31, offset=10):
+    """
+    Binarize the image.
+    Args:
+        method (str): 'otsu' (one global threshold) or 'adaptive' (per neighbourhood, for uneven lighting)
+        block_size (int): Neighbourhood size for adaptive thresholding (odd)
+        offset (int): Constant subtracted from the neighbourhood mean
+    """
+    gray = _gray(img)
+    if method == 'adaptive':
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, offset)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+def crop_text(img, margin=10, min_area=50):
+    """
+    Crop to the bounding box of the text, dropping empty borders and small specks.
+    Args:
+        margin (int): Pixels kept around the text
+        min_area (int): Smaller blobs (after joining characters into words) are ignored
+    """
+    # Join characters into word blobs so isolated specks can be told apart
+    blobs = cv2.dilate(_text_mask(img), cv2.getStructuringElement(cv2.MORPH_RECT, (15, 5)))
+    contours, _ = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_area]
+    if not boxes:
+        return img
+    x0 = max(min(x for x, _, _, _ in boxes) - margin, 0)
+    y0 = max(min(y for _, y, _, _ in boxes) - margin, 0)
+    x1 = min(max(x + w for x, _, w, _ in boxes) + margin, img.shape[1])
+    y1 = min(max(y + h for _, y, _, h in boxes) + margin, img.shape[0])
+    return img[y0:y1, x0:x1]
+
+STAGES = {
+    'grayscale': grayscale,
+    'downscale': downscale,
+    'deskew': deskew,
+    'denoise': denoise,
+    'threshold': threshold,
+    'crop': crop_text,
+}
+
+class StageCache:
+    """
+    Intermediate images keyed by (image hash, pipeline prefix), held in an
+    in-process LRU bounded by bytes and optionally saved as PNG files.
+    Args:
+        cache_dir (str): Directory for PNG copies, or None for memory only
+        max_bytes (int): Memory budget for cached arrays
+    """
+
+    def __init__(self, cache_dir=STAGE_CACHE_DIR, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def _path(self, digest, prefix):
+        return os.path.join(self.cache_dir, prefix, f"{digest}.png")
+
+    def get(self, digest, prefix):
+        key = (digest, prefix)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        path = self._path(digest, prefix) if self.cache_dir else None
+        if path and os.path.exists(path):
+            img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if img is not None:
+                self._remember(key, img)
+                return img
+        return None
+
+    def _remember(self, key, img):
+        with self.lock:
+            if key in self.memory:
+                return
+            self.memory[key] = img
+            self.size += img.nbytes
+            while self.size > self.max_bytes and self.memory:
+                _, old = self.memory.popitem(last=False)
+                self.size -= old.nbytes
+
+    def put(self, digest, prefix, img):
+        self._remember((digest, prefix), img)
+        if self.cache_dir:
+            path = self._path(digest, prefix)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # PNG is lossless, so a cached stage gives exactly the image it replaced
+            ok, encoded = cv2.imencode('.png', img)
+            if ok:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(encoded.tobytes())
+                os.replace(tmp_path, path)
+
+class Pipeline:
+    """
+    An ordered list of preprocessing stages.
+    Args:
+        steps (list): Dicts with a 'stage' name from STAGES, that stage's keyword
+            arguments, and optionally 'cache': true to keep its output in a StageCache
+    """
+
+    def __init__(self, steps=None):
+        self.steps = [dict(step) for step in (steps or DEFAULT_PIPELINE)]
+        for step in self.steps:
+            if step.get('stage') not in STAGES:
+                raise ValueError(f"Unknown preprocessing stage '{step.get('stage')}'. Choose from: {', '.join(STAGES)}")
+        # Key of each prefix of the pipeline; the cache flag doesn't change the output
+        params = [{k: v for k, v in step.items() if k != 'cache'} for step in self.steps]
+        self.prefix_keys = [config_key(params[:i + 1]) for i in range(len(params))]
+        self.caches = any(step.get('cache') for step in self.steps)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load steps from a JSON list."""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def for_dataset(cls, image_dir):
+        """The pipeline declared in image_dir/pipeline.json, or the default one."""
+        path = os.path.join(image_dir, PIPELINE_FILE)
+        if os.path.exists(path):
+            logger.info(f"Using preprocessing pipeline from {path}")
+            return cls.from_file(path)
+        return cls()
+
+    def key(self):
+        """Changes whenever any stage or parameter changes."""
+        return self.prefix_keys[-1] if self.prefix_keys else config_key([])
+
+    def run(self, img, digest=None, cache=None):
+        """
+        Run the stages in order, resuming from the latest cached stage when possible.
+        Args:
+            img (np.ndarray): Decoded BGR or grayscale image
+            digest (str): Image content hash; required for caching
+            cache (StageCache): Cache for steps marked 'cache'
+        Returns:
+            tuple: (processed image, dict of seconds per stage)
+        """
+        timings = {}
+        start_index = 0
+        use_cache = cache is not None and digest is not None
+        if use_cache:
+            for i in range(len(self.steps) - 1, -1, -1):
+                if self.steps[i].get('cache'):
+                    cached = cache.get(digest, self.prefix_keys[i])
+                    if cached is not None:
+                        img, start_index = cached, i + 1
+                        break
+        for i in range(start_index, len(self.steps)):
+            step = self.steps[i]
+            kwargs = {k: v for k, v in step.items() if k not in ('stage', 'cache')}
+            start = time.perf_counter()
+            img = STAGES[step['stage']](img, **kwargs)
+            timings[step['stage']] = timings.get(step['stage'], 0.0) + time.perf_counter() - start
+            if use_cache and step.get('cache'):
+                cache.put(digest, self.prefix_keys[i], img)
+        return img, timings
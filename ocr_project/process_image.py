@@ -1,8 +1,12 @@
 import os
 import zipfile
 import logging
-from ocr_processor import extract_text
-from database import store_ocr_result
+import argparse
+from itertools import islice
+from batch_ocr import ocr_images, iter_image_paths, INPUT_EXTENSIONS
+from documents import expand_documents
+from preprocessing import Pipeline
+from ingest import ingest_directory, watch, WATCH_INTERVAL
 import subprocess
 
 # Set up logging
@@ -35,32 +39,75 @@ def download_kaggle_dataset(dataset='suvroo/scanned-images-dataset-for-ocr-and-v
         logger.error(f"Error downloading dataset: {e}")
         raise
 
-def process_dataset(image_dir='static/images', max_images=10):
-    """Process images in the specified directory."""
+def process_dataset(image_dir='static/images', max_images=None, workers=None, max_in_flight=None,
+                    timeout=120, batch_size=50, pipeline=None, incremental=False):
+    """
+    OCR every image in the specified directory across a process pool.
+    Multi-page TIFF and PDF files are split into pages, which are OCR'd in
+    parallel and stored in the pages table under a documents row.
+    Args:
+        image_dir (str): Directory of images and documents
+        max_images (int): Stop after this many files (None for all)
+        workers (int): Worker processes (defaults to the CPU count)
+        max_in_flight (int): Images queued to the pool at once (defaults to 2 x workers)
+        timeout (float): Seconds allowed per image
+        batch_size (int): Results per database transaction
+        pipeline (Pipeline): Preprocessing stages (defaults to image_dir/pipeline.json if present,
+            else grayscale + Otsu threshold)
+        incremental (bool): Scan subdirectories too and skip files already ingested and unchanged
+            since (see ingest.py)
+    Returns:
+        dict: Run summary (images, errors, images/sec, per-stage timings), or None on failure
+              (or when an incremental run found nothing new)
+    """
     try:
         if not os.path.exists(image_dir):
             os.makedirs(image_dir)
         
         # Download Kaggle dataset if no images exist
-        if not any(f.endswith(('.png', '.jpg', '.jpeg')) for f in os.listdir(image_dir)):
+        if next(iter_image_paths(image_dir, INPUT_EXTENSIONS), None) is None:
             download_kaggle_dataset(download_path=image_dir)
         
-        # Process images (limit to max_images for efficiency)
-        image_count = 0
-        for filename in os.listdir(image_dir):
-            if filename.endswith(('.png', '.jpg', '.jpeg')) and image_count < max_images:
-                image_path = os.path.join(image_dir, filename)
-                result = extract_text(image_path)
-                store_ocr_result(result)
-                logger.info(f"Processed {image_path}: {result['text'][:50]}...")
-                image_count += 1
+        if pipeline is None:
+            pipeline = Pipeline.for_dataset(image_dir)
+        if incremental:
+            summary = ingest_directory(image_dir, max_files=max_images, workers=workers, max_in_flight=max_in_flight,
+                                       timeout=timeout, batch_size=batch_size, pipeline=pipeline)
+            if summary is None:
+                logger.info(f"No new or changed files in {image_dir}")
+            return summary
+        image_paths = iter_image_paths(image_dir, INPUT_EXTENSIONS)
+        if max_images is not None:
+            image_paths = islice(image_paths, max_images)
+        summary = ocr_images(expand_documents(image_paths), workers=workers, max_in_flight=max_in_flight,
+                             timeout=timeout, batch_size=batch_size, pipeline=pipeline)
         
-        if image_count == 0:
+        if summary['images'] == 0:
             logger.warning(f"No valid images found in {image_dir}")
         else:
-            logger.info(f"Processed {image_count} images")
+            logger.info(f"Processed {summary['images']} images")
+        return summary
     except Exception as e:
         logger.error(f"Error processing dataset: {e}")
+        return None
 
 if __name__ == '__main__':
-    process_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='OCR a directory of images and multi-page TIFF/PDF documents into data/ocr_data.db.')
+    parser.add_argument('--image-dir', default='static/images', help='Directory of images')
+    parser.add_argument('--max-images', type=int, help='Stop after this many files (default: all)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--max-in-flight', type=int, help='Images queued to the pool at once (default: 2 x workers)')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed per image')
+    parser.add_argument('--batch-size', type=int, default=50, help='Results per database transaction')
+    parser.add_argument('--pipeline', help='Preprocessing pipeline JSON (default: <image-dir>/pipeline.json if present)')
+    parser.add_argument('--incremental', action='store_true', help='Only OCR files that are new or changed since the last run')
+    parser.add_argument('--watch', action='store_true', help='Keep running and OCR files as they arrive (implies --incremental)')
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL, help='Seconds between scans with --watch')
+    args = parser.parse_args()
+    pipeline = Pipeline.from_file(args.pipeline) if args.pipeline else None
+    if args.watch:
+        watch(args.image_dir, args.interval, max_files=args.max_images, workers=args.workers,
+              max_in_flight=args.max_in_flight, timeout=args.timeout, batch_size=args.batch_size, pipeline=pipeline)
+    else:
+        process_dataset(args.image_dir, args.max_images, args.workers, args.max_in_flight, args.timeout,
+                        args.batch_size, pipeline, args.incremental)
\ No newline at end of file